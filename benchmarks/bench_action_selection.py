@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""Action selection benchmark
+
+Times the decision step of the LSMC engines (argmax over the action values of one
+inventory/rights level, then mapping the argmax indices to actions) with the former
+per-path Python loop and with the array version now used by the engines.
+
+    python benchmarks/bench_action_selection.py
+"""
+
+import time
+import numpy as np
+
+actions = [-10, 0, 10]
+
+
+def select_loop(h):
+    idx = np.nanargmax(h, axis=0)
+    optimal_action = np.empty(h.shape[1])
+    for k in range(len(idx)):
+      optimal_action[k] = -actions[int(idx[k])]
+    return optimal_action
+
+
+def select_array(h):
+    idx = np.nanargmax(h, axis=0)
+    return -np.take(actions, idx)
+
+
+def best_of(f, h, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f(h)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(paths=(10000, 100000, 1000000), seed=123):
+    rng = np.random.default_rng(seed)
+    print('{:>10} {:>12} {:>12} {:>9}'.format('paths', 'loop [s]', 'array [s]', 'speedup'))
+    for n in paths:
+        h = rng.standard_normal((len(actions), n))
+        assert np.array_equal(select_loop(h), select_array(h))
+        t_loop = best_of(select_loop, h)
+        t_array = best_of(select_array, h)
+        print('{:>10} {:>12.5f} {:>12.5f} {:>8.1f}x'.format(n, t_loop, t_array, t_loop/t_array))
+
+
+if __name__ == '__main__':
+    main()
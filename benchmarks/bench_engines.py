@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""Engine benchmark and regression check
+
+Solves storage and swing contracts over a matrix of path counts, horizons, inventory
+or rights grid sizes and regression degrees, on synthetic GBM paths (no data files),
+and records for every case the wall time of the backward induction (best of --repeat
+runs, path simulation excluded), the peak memory it allocates and the price.
+
+Results are compared with benchmarks/baselines.json: a case fails when it is slower
+than --time-tolerance x its baseline, allocates more than --memory-tolerance x the
+baseline peak, or when its price moves by more than --price-tolerance (relative).
+Timings only compare on the machine that wrote the baselines; refresh them there with
+--update after an intended change.
+
+    python benchmarks/bench_engines.py                 # default cases, compare
+    python benchmarks/bench_engines.py --large         # add the 1M-path and 8760-step cases
+    python benchmarks/bench_engines.py --cases swing --update
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from energy_lsmc.pricepaths import GBM, simulate_paths
+from energy_lsmc.storagelsmc import StorageLSMC7
+from energy_lsmc.swingoption_lsmc import SwingOptionsLSMC2
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+S0, GAMMA, DIV, SIGMA = 30., 0.06, 0.06, 0.59
+
+# name: (engine, simulations, steps M, grid, deg); grid is I_max with DCQ 10 (storage) or ACQ with DCQ 5 (swing)
+CASES = {
+    'storage-1k-24-g11-d3': ('storage', 1000, 24, 100, 3),
+    'storage-10k-24-g11-d5': ('storage', 10000, 24, 100, 5),
+    'storage-10k-365-g11-d3': ('storage', 10000, 365, 100, 3),
+    'storage-10k-365-g41-d3': ('storage', 10000, 365, 400, 3),
+    'storage-100k-24-g11-d3': ('storage', 100000, 24, 100, 3),
+    'swing-1k-24-r8-d3': ('swing', 1000, 24, 40, 3),
+    'swing-10k-365-r8-d5': ('swing', 10000, 365, 40, 5),
+    'swing-10k-365-r40-d3': ('swing', 10000, 365, 200, 3),
+    'swing-100k-24-r8-d3': ('swing', 100000, 24, 40, 3),
+}
+LARGE = {
+    'storage-1m-24-g11-d3': ('storage', 1000000, 24, 100, 3),
+    'swing-1m-24-r8-d3': ('swing', 1000000, 24, 40, 3),
+    'storage-100k-365-g11-d5': ('storage', 100000, 365, 100, 5),
+    'storage-1k-8760-g11-d3': ('storage', 1000, 8760, 100, 3),
+    'swing-1k-8760-r40-d3': ('swing', 1000, 8760, 200, 3),
+}
+
+
+def engine(kind, simulations, M, grid, deg, prices):
+    if kind == 'storage':
+        return StorageLSMC7(S0, 1, M, GAMMA, DIV, SIGMA, grid, 0, 10, simulations, deg, prices)
+    return SwingOptionsLSMC2(S0, S0, 1, M, GAMMA, DIV, SIGMA, grid, 5, 10, simulations, deg, prices)
+
+
+def run_case(case, repeat):
+    """ Best solve time (s), peak allocation of one solve (MB) and price of a case """
+    kind, simulations, M, grid, deg = case
+    prices = simulate_paths(GBM(S0, GAMMA, SIGMA), 1, M, simulations, seed=123)
+    seconds = float('inf')
+    for _ in range(repeat):
+        e = engine(kind, simulations, M, grid, deg, prices)
+        start = time.perf_counter()
+        e.solve()
+        seconds = min(seconds, time.perf_counter() - start)
+    e = engine(kind, simulations, M, grid, deg, prices)
+    tracemalloc.start()
+    price = float(e.price)
+    peak = tracemalloc.get_traced_memory()[1] / 2.**20
+    tracemalloc.stop()
+    return {'seconds': seconds, 'peak_mb': peak, 'price': price}
+
+
+def compare(result, baseline, args):
+    """ Reasons a result fails against its baseline, empty when it passes """
+    failures = []
+    if result['seconds'] > args.time_tolerance * baseline['seconds']:
+        failures.append('time x%.2f' % (result['seconds'] / baseline['seconds']))
+    if result['peak_mb'] > args.memory_tolerance * baseline['peak_mb']:
+        failures.append('memory x%.2f' % (result['peak_mb'] / baseline['peak_mb']))
+    if abs(result['price'] - baseline['price']) > args.price_tolerance * max(abs(baseline['price']), 1.):
+        failures.append('price %+.3g' % (result['price'] - baseline['price']))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--large', action='store_true', help='also run the 1M-path and 8760-step cases')
+    parser.add_argument('--cases', default='', help='only run cases whose name contains this text')
+    parser.add_argument('--repeat', type=int, default=3, help='timed solves per case, the best counts')
+    parser.add_argument('--update', action='store_true', help='write the results as the new baselines')
+    parser.add_argument('--time-tolerance', type=float, default=1.5)
+    parser.add_argument('--memory-tolerance', type=float, default=1.2)
+    parser.add_argument('--price-tolerance', type=float, default=1e-6)
+    args = parser.parse_args()
+
+    cases = dict(CASES, **LARGE) if args.large else dict(CASES)
+    cases = dict((name, case) for name, case in cases.items() if args.cases in name)
+    baselines = {}
+    if os.path.exists(BASELINES):
+        with open(BASELINES) as f:
+            baselines = json.load(f)
+
+    failed = False
+    print('%-26s %10s %10s %16s  %s' % ('case', 'seconds', 'peak MB', 'price', 'vs baseline'))
+    for name in sorted(cases):
+        result = run_case(cases[name], 1 if name in LARGE else args.repeat)
+        if args.update or name not in baselines:
+            status = 'recorded' if args.update else 'no baseline'
+            if args.update:
+                baselines[name] = result
+        else:
+            failures = compare(result, baselines[name], args)
+            failed |= bool(failures)
+            status = ', '.join(failures) or 'ok (time x%.2f)' % (result['seconds'] / baselines[name]['seconds'])
+        print('%-26s %10.3f %10.1f %16.6f  %s' % (name, result['seconds'], result['peak_mb'], result['price'], status))
+
+    if args.update:
+        with open(BASELINES, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write('\n')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""Import-time benchmark
+
+Times `import energy_lsmc.storagelsmc, energy_lsmc.swingoption_lsmc` (and the other modules) in fresh
+interpreters against a bare `import numpy`, and checks that no heavy optional
+dependency is loaded on the way. Exits with status 1 when the engines add more than
+--budget seconds on top of NumPy or pull in a heavy module, so it can guard CI.
+
+    python benchmarks/bench_import.py --budget 0.15
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ['energy_lsmc.' + name for name in ('storagelsmc', 'swingoption_lsmc', 'portfolio', 'cache', 'valuate', 'server')]
+HEAVY = ['IPython', 'matplotlib', 'seaborn', 'pandas', 'scipy', 'past']
+
+PROBE = '''
+import sys, time
+start = time.perf_counter()
+{imports}
+elapsed = time.perf_counter() - start
+print(elapsed, ','.join(m for m in {heavy!r} if m in sys.modules))
+'''
+
+
+def import_time(imports, repeat):
+    """ Best wall time of the import statements over `repeat` fresh interpreters, and the heavy modules loaded """
+    best, loaded = float('inf'), ''
+    for _ in range(repeat):
+        out = subprocess.check_output([sys.executable, '-c', PROBE.format(imports=imports, heavy=HEAVY)],
+                                      cwd=ROOT, env=dict(os.environ, PYTHONDONTWRITEBYTECODE='1'))
+        seconds, _, modules = out.decode().strip().partition(' ')
+        best, loaded = min(best, float(seconds)), modules
+    return best, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--budget', type=float, default=0.15, help='allowed seconds on top of import numpy')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    numpy, _ = import_time('import numpy', args.repeat)
+    print('%-40s %8.1f ms' % ('numpy', numpy*1e3))
+    failed = False
+    for module in MODULES:
+        seconds, loaded = import_time('import numpy\nimport ' + module, args.repeat)
+        extra = seconds - numpy
+        print('%-40s %8.1f ms  (+%.1f ms)%s' % (module, seconds*1e3, extra*1e3, '  loads ' + loaded if loaded else ''))
+        failed |= extra > args.budget or bool(loaded)
+    if failed:
+        print('import-time regression: over budget or heavy modules loaded')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+"""Valuation of energy storage and swing options by least-squares Monte Carlo
+
+    from energy_lsmc.storagelsmc import StorageLSMC7
+    from energy_lsmc.swingoption_lsmc import SwingOptionsLSMC2
+
+The engines are in storagelsmc and swingoption_lsmc, price paths in pricepaths and
+pathstore, portfolio, cache and server value many contracts, valuate is the command
+line. Nothing is imported with the package itself, so `valuate --help` stays quick.
+"""
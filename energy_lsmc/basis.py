@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""Regression bases and solvers for the continuation values
+
+By default the engines regress on raw monomials 1, x, ..., x^deg with an SVD
+least-squares solve, which reproduces np.polyfit. Raw powers of prices around 20-200
+make the design matrix badly conditioned, so an engine can be given a Regression
+instead:
+
+    regression = Regression(Chebyshev(5), solver='qr')
+    s = StorageLSMC7(..., regression=regression, trace=True)
+    s.price
+    s.trace.arrays()['condition']      # condition number of every step's design matrix
+
+A basis maps the prices X of one time step to a design matrix, after fitting a few
+scaling numbers to that step's prices (range, mean or quantiles), so every column is
+of order one:
+
+    Monomial(deg)          powers of X/mean(X)
+    Chebyshev(deg)         Chebyshev polynomials of X mapped onto [-1, 1]
+    Laguerre(deg)          weighted Laguerre functions of X/mean(X) (Longstaff & Schwartz 2001)
+    PiecewiseLinear(knots) 1, x and hinges (x-k)+ at price quantiles
+    LocalLinear(bins)      a constant and a slope on each of `bins` quantile bins (disjoint supports)
+
+The solver works on the column-equilibrated design matrix: 'qr' (Householder QR),
+'cholesky' (normal equations, the cheapest, falls back to 'lstsq' when the Gram matrix
+is singular) or 'lstsq' (SVD). The design matrix and its factorization are built once
+per time step and used for the fit and for the fitted values of all states. With
+cache=True they are kept across solves on the same price matrix (e.g. contracts
+revalued on one path set), at the cost of one (paths x basis size) array per time step
+for 'qr' and about two for the other solvers.
+"""
+
+import numpy as np
+
+
+class Monomial(object):
+    """ 1, z, ..., z^deg with z = X / mean(X) """
+
+    name = 'monomial'
+
+    def __init__(self, deg):
+        assert deg > 0
+        self.deg = int(deg)
+        self.size = self.deg + 1
+
+    def spec(self):
+        return {'basis': self.name, 'deg': self.deg}
+
+    def fit(self, X):
+        """ Scaling parameters of one time step's prices """
+        scale = np.mean(np.abs(X))
+        return np.array([scale if scale > 0 else 1.])
+
+    def design(self, X, scaling):
+        """ (n, size) design matrix of the prices X """
+        return np.vander(X / scaling[0], self.size, increasing=True)
+
+
+class Chebyshev(Monomial):
+    """ Chebyshev polynomials T_0..T_deg of X mapped from [min X, max X] onto [-1, 1] """
+
+    name = 'chebyshev'
+
+    def fit(self, X):
+        lo, hi = np.min(X), np.max(X)
+        return np.array([lo, hi if hi > lo else lo + 1.])
+
+    def design(self, X, scaling):
+        lo, hi = scaling
+        z = (2.*X - lo - hi) / (hi - lo)
+        A = np.empty((X.shape[0], self.size))
+        A[:, 0] = 1.
+        A[:, 1] = z
+        for k in range(2, self.size):
+            A[:, k] = 2.*z*A[:, k-1] - A[:, k-2]
+        return A
+
+
+class Laguerre(Monomial):
+    """ Weighted Laguerre functions exp(-z/2) L_k(z), k = 0..deg, with z = X / mean(X) """
+
+    name = 'laguerre'
+
+    def design(self, X, scaling):
+        z = X / scaling[0]
+        A = np.empty((X.shape[0], self.size))
+        A[:, 0] = 1.
+        A[:, 1] = 1. - z
+        for k in range(1, self.size - 1):
+            A[:, k+1] = ((2*k + 1 - z)*A[:, k] - k*A[:, k-1]) / (k + 1)
+        A *= np.exp(-z/2.)[:, np.newaxis]
+        return A
+
+
+class PiecewiseLinear(object):
+    """ Continuous piecewise-linear functions: 1, z and (z - k_j)+ at `knots` price quantiles, z = X / mean(X) """
+
+    name = 'piecewise'
+
+    def __init__(self, knots):
+        assert knots > 0
+        self.knots = int(knots)
+        self.size = self.knots + 2
+
+    def spec(self):
+        return {'basis': self.name, 'knots': self.knots}
+
+    def fit(self, X):
+        scale = np.mean(np.abs(X))
+        scale = scale if scale > 0 else 1.
+        quantiles = np.quantile(X, np.arange(1, self.knots + 1) / (self.knots + 1.))
+        return np.concatenate(([scale], quantiles / scale))
+
+    def design(self, X, scaling):
+        z = X / scaling[0]
+        A = np.empty((X.shape[0], self.size))
+        A[:, 0] = 1.
+        A[:, 1] = z
+        A[:, 2:] = np.maximum(z[:, np.newaxis] - scaling[1:], 0.)
+        return A
+
+
+class LocalLinear(object):
+    """ Local regression: a constant and a slope in z = X / mean(X) on each of `bins` price-quantile bins.
+    Prices beyond the outer bins use the first or last bin """
+
+    name = 'local'
+
+    def __init__(self, bins):
+        assert bins > 0
+        self.bins = int(bins)
+        self.size = 2 * self.bins
+
+    def spec(self):
+        return {'basis': self.name, 'bins': self.bins}
+
+    def fit(self, X):
+        scale = np.mean(np.abs(X))
+        scale = scale if scale > 0 else 1.
+        z = X / scale
+        edges = np.quantile(z, np.arange(1, self.bins) / float(self.bins))
+        centers = np.array([np.mean(z[(np.searchsorted(edges, z, side='right') == j)]) if z.size else 0.
+                            for j in range(self.bins)])
+        return np.concatenate(([scale], edges, np.nan_to_num(centers)))
+
+    def design(self, X, scaling):
+        z = X / scaling[0]
+        edges, centers = scaling[1:self.bins], scaling[self.bins:]
+        bin_of = np.searchsorted(edges, z, side='right')
+        rows = np.arange(X.shape[0])
+        A = np.zeros((X.shape[0], self.size))
+        A[rows, 2*bin_of] = 1.
+        A[rows, 2*bin_of + 1] = z - centers[bin_of]
+        return A
+
+
+BASES = {'monomial': Monomial, 'chebyshev': Chebyshev, 'laguerre': Laguerre,
+         'piecewise': PiecewiseLinear, 'local': LocalLinear}
+
+
+class Regression(object):
+    """ Least-squares projection of the continuation values on a basis
+    basis : basis object, default Chebyshev(5)
+    solver : str : 'qr', 'cholesky' or 'lstsq'
+    cache : bool : keep the design matrices and factorizations of every time step across solves
+    Coefficients are (basis size, targets), in the basis' own column order.
+    """
+
+    def __init__(self, basis=None, solver='qr', cache=False):
+        if solver not in ('qr', 'cholesky', 'lstsq'):
+            raise ValueError('Error: unknown solver {}'.format(solver))
+        self.basis = Chebyshev(5) if basis is None else basis
+        self.solver = solver
+        self.cache = bool(cache)
+        self._steps = {}
+
+    def spec(self):
+        return {'basis': self.basis.spec(), 'solver': self.solver}
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_steps'] = {}   # <-------- factorizations are rebuilt, not pickled to workers
+        return state
+
+    def _step(self, t, X):
+        """ Design matrix and factorization of time step t, built once for the prices X """
+        step = self._steps.get(t)
+        if step is not None and _same_array(step['X'], X):
+            return step
+        if not self.cache:
+            self._steps.clear()
+        scaling = self.basis.fit(X)
+        A = self.basis.design(X, scaling)
+        norms = np.sqrt((A*A).sum(axis=0))
+        norms[norms == 0] = 1.
+        scaled = A / norms
+        step = {'X': X, 'scaling': scaling, 'A': A, 'norms': norms, 'solver': self.solver}
+        if self.solver == 'cholesky':
+            try:
+                step['L'] = np.linalg.cholesky(np.dot(scaled.T, scaled))
+                step['condition'] = _condition(step['L'])
+            except np.linalg.LinAlgError:
+                step['solver'] = 'lstsq'
+        if step['solver'] == 'qr':
+            step['Q'], step['R'] = np.linalg.qr(scaled)
+            step['condition'] = _condition(step['R'])
+            del step['A']   # <-------- A = Q R diag(norms), the fitted values need no second (n, size) array
+        if step['solver'] == 'lstsq':
+            step['scaled'] = scaled
+            step['condition'] = _condition(scaled)
+        self._steps[t] = step
+        return step
+
+    def coefficients(self, t, X, Y):
+        """ Coefficients (size, targets) of the rows of Y regressed on the basis of X at step t """
+        step = self._step(t, X)
+        if step['solver'] == 'qr':
+            coefficients = np.linalg.lstsq(step['R'], np.dot(step['Q'].T, Y.T), rcond=None)[0]
+        elif step['solver'] == 'cholesky':
+            L = step['L']
+            right = np.dot(Y, step['A']) / step['norms']
+            coefficients = np.linalg.solve(L.T, np.linalg.solve(L, right.T))
+        else:
+            coefficients = np.linalg.lstsq(step['scaled'], Y.T, rcond=X.shape[0]*np.finfo(float).eps)[0]
+        return coefficients / step['norms'][:, np.newaxis]
+
+    def values(self, t, X, coefficients):
+        """ Fitted values (targets, n) of the coefficients at the prices X of step t """
+        step = self._step(t, X)
+        if 'A' not in step:
+            return np.dot(step['Q'], np.dot(step['R'], coefficients*step['norms'][:, np.newaxis])).T
+        return np.dot(step['A'], coefficients).T
+
+    def condition(self, t):
+        """ Condition number of the equilibrated design matrix of step t """
+        step = self._steps.get(t)
+        return np.nan if step is None else step['condition']
+
+    def scalings(self, prices):
+        """ (T, p) scaling parameters of every time step 1..T of a price matrix """
+        return np.array([self.basis.fit(np.asarray(prices[t])) for t in range(1, prices.shape[0])])
+
+
+def _same_array(a, b):
+    return a is b or (a.shape == b.shape and a.strides == b.strides and a.dtype == b.dtype
+                      and a.__array_interface__['data'][0] == b.__array_interface__['data'][0])
+
+
+def _condition(A):
+    s = np.linalg.svd(A, compute_uv=False)
+    return s[0] / s[-1] if s[-1] > 0 else np.inf
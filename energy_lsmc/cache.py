@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""Persistent valuation cache
+
+Results of solved contracts are kept on disk and found again by a key made of
+
+    engine class + canonical contract parameters + fingerprint of the price paths
+
+where the fingerprint is a content hash of the price matrix (shape, dtype and every
+price), or, when the engine simulates its own paths, nothing more than the
+parameters that determine the simulation (streaming engines simulate in fixed path
+blocks, so their chunk_size and workdir do not enter the key). A record holds the price, its standard
+error, the policy in the engine's dtype (compressed) and the (T, deg+1, states) regression coefficients, so an
+unchanged contract valued against an unchanged scenario file is a file read instead
+of a backward induction.
+
+    cache = ValuationCache('/data/lsmc-cache', max_bytes=20*2**30)
+    result = cache.valuate(StorageLSMC7(..., providedPrice_matrix=store))
+    result.price, result.policy, PolicyModel(result.coefficients)
+
+Records are written to a temporary file and renamed into place, so readers never see
+a partial record, and writers (e.g. the workers of value_portfolio) serialize on a
+lock file while they add records and evict the least recently used ones beyond
+max_bytes. Reads take no lock; a hit refreshes the modification time of its record.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from collections import namedtuple
+import numpy as np
+from .pathstore import PathStore, open_prices
+from .streaming import PATH_BLOCK, StreamingLSMC
+
+try:
+    import fcntl
+except ImportError:   # <-------- no advisory locks (Windows): records are still replaced atomically
+    fcntl = None
+
+CachedValuation = namedtuple('CachedValuation', ['price', 'standard_error', 'policy', 'coefficients'])
+
+FORMAT = 2   # <-------- 2: streaming engines simulate in fixed path blocks, whatever their chunk_size
+_fingerprints = {}
+
+
+def fingerprint(prices, rows=256):
+    """ Content hash of a price matrix (array, PathStore or file name), read `rows` time steps at a time.
+    Hashes of path stores and .npy files are remembered per process while the file is unchanged """
+    source = prices.filename if isinstance(prices, PathStore) else prices if isinstance(prices, str) else None
+    if source is not None:
+        stat = os.stat(source)
+        memo = (os.path.realpath(source), stat.st_size, stat.st_mtime_ns)
+        if memo in _fingerprints:
+            return _fingerprints[memo]
+    prices = open_prices(prices)
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(json.dumps([list(prices.shape), np.dtype(prices.dtype).str]).encode('utf-8'))
+    for start in range(0, prices.shape[0], rows):
+        digest.update(np.ascontiguousarray(prices[start:start + rows]).tobytes())
+    result = digest.hexdigest()
+    if source is not None:
+        _fingerprints[memo] = result
+    return result
+
+
+def _canonical(value):
+    """ JSON-able form of a contract parameter """
+    if isinstance(value, np.ndarray):
+        return [_canonical(v) for v in value.tolist()]
+    if isinstance(value, (list, tuple)):
+        return [_canonical(v) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)   # <-------- 5 and 5.0 give the same key
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if hasattr(value, 'spec'):
+        return {'class': type(value).__name__, 'parameters': _canonical(value.spec())}   # <-------- e.g. a Regression, without its cached factorizations
+    if isinstance(value, dict):
+        return dict((k, _canonical(v)) for k, v in sorted(value.items()))
+    return {'class': type(value).__name__, 'parameters': dict((k, _canonical(v)) for k, v in sorted(vars(value).items()))}
+
+
+def contract_key(engine, paths=None):
+    """ Cache key of an engine: hash of its class, canonical contract parameters and path fingerprint
+    paths : str : fingerprint of the engine's price matrix when already known, computed otherwise """
+    parameters = {}
+    for name in engine._contract_parameters:
+        if name == 'providedPrice_matrix':
+            continue
+        value = getattr(engine, name)
+        if name == 'price_model' and value is None:
+            value = engine._path_model()
+        parameters[name] = _canonical(value)
+    if engine.providedPrice_matrix is None:
+        parameters['scrambles'] = engine.scrambles   # <-------- simulated paths: the parameters fix them
+        if isinstance(engine, StreamingLSMC):
+            parameters['path_block'] = PATH_BLOCK   # <-------- and the block scheme of simulate_to_disk, not chunk_size
+    else:
+        parameters['paths'] = paths or fingerprint(engine.providedPrice_matrix)
+    text = json.dumps({'format': FORMAT, 'engine': type(engine).__name__, 'parameters': parameters}, sort_keys=True)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class ValuationCache(object):
+    """ Directory of solved contracts with least-recently-used eviction
+    directory : str : where the records are kept, created when missing
+    max_bytes : int : total size of the records kept, older records are evicted beyond it
+    """
+
+    def __init__(self, directory, max_bytes=2**30):
+        assert max_bytes > 0
+        self.directory = directory
+        self.max_bytes = int(max_bytes)
+        os.makedirs(directory, exist_ok=True)
+
+    def _record(self, key):
+        return os.path.join(self.directory, key + '.npz')
+
+    def get(self, key):
+        """ CachedValuation of the key, None when it is not cached """
+        filename = self._record(key)
+        try:
+            with np.load(filename) as record:
+                result = CachedValuation(float(record['price']), float(record['standard_error']),
+                                         record['policy'], record['coefficients'])
+            os.utime(filename)
+        except (OSError, KeyError, ValueError):   # <-------- missing, just evicted or unreadable: a miss
+            return None
+        return result
+
+    def put(self, key, result):
+        """ Stores a CachedValuation under key and evicts the least recently used records beyond max_bytes """
+        handle, temporary = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as f:
+                np.savez_compressed(f, price=result.price, standard_error=result.standard_error,
+                         policy=result.policy, coefficients=result.coefficients)
+            with self._lock():
+                os.replace(temporary, self._record(key))
+                self._evict()
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+
+    def valuate(self, engine, paths=None):
+        """ Cached result of the engine, solving and storing it on a miss
+        paths : str : fingerprint of the engine's price matrix, see fingerprint() """
+        key = contract_key(engine, paths)
+        result = self.get(key)
+        if result is None:
+            solution = engine.solve()
+            result = CachedValuation(float(solution.price), float(solution.standard_error),
+                                     np.asarray(solution.policy), solution.coefficients)
+            self.put(key, result)
+        return result
+
+    def size(self):
+        return sum(os.path.getsize(os.path.join(self.directory, f)) for f in self._records())
+
+    def clear(self):
+        with self._lock():
+            for name in self._records():
+                os.remove(os.path.join(self.directory, name))
+
+    def _records(self):
+        return [f for f in os.listdir(self.directory) if f.endswith('.npz')]
+
+    def _evict(self):
+        """ Removes the least recently used records until the cache fits max_bytes (caller holds the lock) """
+        records = []
+        for name in self._records():
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            records.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in records)
+        for _, size, name in sorted(records):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.directory, name))
+            total -= size
+
+    def _lock(self):
+        return _FileLock(os.path.join(self.directory, '.lock'))
+
+
+class _FileLock(object):
+    """ Exclusive advisory lock on a file, held for a with block """
+
+    def __init__(self, filename):
+        self.filename = filename
+
+    def __enter__(self):
+        self.f = open(self.filename, 'a')
+        if fcntl is not None:
+            fcntl.flock(self.f, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self.f, fcntl.LOCK_UN)
+        self.f.close()
@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""Monte Carlo price estimates and their standard errors
+
+The LSMC price is the mean of one value per price path. Its standard error is
+computed from independent groups of paths (antithetic pairs, scrambled Sobol
+batches or single paths, see pricepaths.path_groups), so the estimate stays honest
+when the paths within a group are dependent.
+
+With control_variate=True the per-path values are first corrected by the strip of
+European calls and puts on every exercise date, observed on the same paths:
+
+    V_cv = V - beta' (C - E[C])
+
+where E[C] is known in closed form for lognormal price models (GBM, MeanReverting)
+and beta is the least-squares slope of V on C. The corrected mean has the same
+expectation and, as the strip is strongly correlated with the contract value, a
+smaller variance.
+
+    s = StorageLSMC7(..., sampling='sobol', control_variate=True)
+    s.price, s.standard_error
+
+price_to_tolerance() sizes the path count per contract instead: it values the contract
+on a growing set of paths, appending a fresh batch each round, until the standard error
+reaches a target. Paths of earlier rounds are kept, and so are the per-step Gram
+matrices A'A of their regressions (on prices centred and scaled in the first round),
+only the new batch is simulated and added to them. A round on N paths gives the
+price of the engine on those N paths.
+
+    estimate = s.price_to_tolerance(target_se=0.5, max_paths=200000)
+    estimate.price, estimate.standard_error, estimate.paths
+"""
+
+from collections import namedtuple
+import numpy as np
+from .pricepaths import lognormal_option_expectations, path_groups, simulate_paths, sobol_path_count
+from .pathstore import open_prices
+
+AdaptiveEstimate = namedtuple('AdaptiveEstimate', ['price', 'standard_error', 'paths'])
+
+
+def standard_error(values, groups):
+    """ Standard error of values.mean() when the paths of different groups are independent
+    values : (n,) per-path values, groups : (n,) integer group label of every path """
+    values = np.asarray(values, dtype=np.float64)
+    sums = np.bincount(groups, weights=values - values.mean())
+    count = np.count_nonzero(np.bincount(groups))
+    if count < 2:
+        return np.nan
+    return np.sqrt(count / (count - 1.) * (sums**2).sum()) / len(values)
+
+
+def control_variate(values, controls, expectations):
+    """ Per-path values corrected by controls with known expectations
+    controls : (k, n) control observations, expectations : (k,) their exact means
+    returns the corrected values and the slopes beta """
+    values = np.asarray(values, dtype=np.float64)
+    deviations = controls - np.asarray(expectations)[:, np.newaxis]
+    centered = deviations - deviations.mean(axis=1)[:, np.newaxis]
+    beta = np.linalg.lstsq(centered.T, values - values.mean(), rcond=None)[0]
+    return values - np.dot(beta, deviations), beta
+
+
+class GramCache(object):
+    """ Per-step regressions of a price matrix that only grows by appended columns
+    The prices of a step are centred and scaled by their mean and standard deviation in the
+    first round, which keeps the Gram matrix A'A of the scaled monomials well conditioned.
+    It is kept and extended with the new paths only; the moments A'Y are recomputed as the
+    regressed values change with every round, and the solution is refined once on the
+    residuals, so the coefficients agree with a least-squares fit on all the paths.
+    """
+
+    def __init__(self, deg):
+        self.deg = int(deg)
+        self.steps = {}
+
+    def coefficients(self, t, X, Y):
+        """ Coefficients (deg+1, targets) of the rows of Y regressed on the prices X at step t,
+        highest power of X first """
+        step = self.steps.get(t)
+        if step is None:
+            spread = X.std()
+            step = self.steps[t] = _GramStep(X.mean(), spread if spread > 0 else 1., self.deg)
+        A = np.vander((X - step.center)/step.spread, self.deg + 1)
+        new = A[step.count:]
+        step.gram += np.dot(new.T, new)
+        step.count = A.shape[0]
+        scale = np.sqrt(np.diag(step.gram))
+        scale[scale == 0] = 1.
+        gram = step.gram/np.outer(scale, scale)
+        solve = lambda R: np.linalg.lstsq(gram, np.dot(A.T, R.T)/scale[:, np.newaxis],
+                                          rcond=A.shape[0]*np.finfo(gram.dtype).eps)[0]/scale[:, np.newaxis]
+        coefficients = solve(Y)
+        coefficients += solve(Y - np.dot(A, coefficients).T)   # <-------- one step of iterative refinement
+        return _monomial_coefficients(coefficients, step.center, step.spread)
+
+
+class _GramStep(object):
+    """ Scaling and accumulated Gram matrix of one time step """
+
+    def __init__(self, center, spread, deg):
+        self.center = float(center)
+        self.spread = float(spread)
+        self.gram = np.zeros((deg + 1, deg + 1))
+        self.count = 0
+
+
+def _monomial_coefficients(coefficients, center, spread):
+    """ Coefficients in powers of X (highest first) of the polynomials in z = (X - center)/spread,
+    by Horner's scheme on the coefficient arrays: p <- p*z + c """
+    result = np.zeros_like(coefficients)
+    for c in coefficients:
+        shifted = -result*(center/spread)
+        shifted[:-1] += result[1:]/spread
+        result = shifted
+        result[-1] += c
+    return result
+
+
+class _AdaptivePaths(object):
+    """ Price paths, path groups and Gram matrices of a price_to_tolerance run """
+
+    def __init__(self, deg):
+        self.prices = None
+        self.groups = None
+        self.grams = GramCache(deg)
+
+
+class VarianceReduction(object):
+    """ Price estimate of an LSMC engine, mixed into the engines
+    sampling : str : 'pseudo' (antithetic pseudo-random shocks) or 'sobol' (scrambled Sobol with Brownian bridge)
+    control_variate : bool : correct the price with the strip of European options on the same paths
+    scrambles : int : number of independently scrambled Sobol batches behind the standard error
+    The engine provides MCprices, discount, time_unit, _path_model() and _control_strike().
+    """
+
+    sampling = 'pseudo'
+    control_variate = False
+    scrambles = 16
+    _adaptive = None
+
+    def _check_sampling(self):
+        if self.sampling not in ('pseudo', 'sobol'):
+            raise ValueError('Error: unknown sampling {}'.format(self.sampling))
+        if self.sampling == 'sobol' and self.providedPrice_matrix is None and \
+                sobol_path_count(self.simulations, self.scrambles) != int(self.simulations):
+            raise ValueError('Error: Sobol sampling needs scrambles * 2^k simulations, e.g. {} instead of {}'
+                             .format(sobol_path_count(self.simulations, self.scrambles), int(self.simulations)))
+
+    def _path_groups(self, sims):
+        """ Independent group of every path of the price matrix """
+        if self._adaptive is not None:
+            return self._adaptive.groups
+        if self.providedPrice_matrix is not None:
+            return np.arange(sims)   # <-------- provided scenarios are taken as independent
+        return path_groups(sims, self.sampling, batches=self.scrambles)
+
+    def _option_controls(self):
+        """ Call and put strips on the exercise dates of every path, discounted to t = 1 like the
+        per-path values, and their expectations """
+        model = self._path_model()
+        if self.providedPrice_matrix is not None or getattr(model, 'log_moments', None) is None:
+            raise ValueError('Error: the control variate needs simulated paths of a lognormal price model (GBM, MeanReverting)')
+        strike = self._control_strike()
+        T = self.MCprices.shape[0]-1
+        controls = np.zeros((2, self.MCprices.shape[1]))
+        for t in range(1, T+1):
+            X = np.asarray(self.MCprices[t,:])
+            controls[0] += self.discount**(t-1)*np.maximum(X - strike, 0)
+            controls[1] += self.discount**(t-1)*np.maximum(strike - X, 0)
+        steps = np.arange(1, T+1)
+        calls, puts = lognormal_option_expectations(*model.log_moments(steps*self.time_unit), strike=strike)
+        factors = self.discount**(steps-1)
+        return controls, np.array([np.dot(factors, calls), np.dot(factors, puts)])
+
+    def _adjusted_values(self, values):
+        """ Per-path values at t = 1, corrected by the option strip with control_variate """
+        values = np.asarray(values, dtype=np.float64)
+        if self.control_variate:
+            values = control_variate(values, *self._option_controls())[0]
+        return values
+
+    def _estimate(self, values):
+        """ Price and standard error of the discounted mean of the per-path values at t = 1 """
+        values = self._adjusted_values(values)
+        return self.discount*np.mean(values), self.discount*standard_error(values, self._path_groups(len(values)))
+
+    def _adaptive_coefficients(self, t, X, Y):
+        """ Regression at step t from the cached Gram matrices of a price_to_tolerance run, None otherwise """
+        if self._adaptive is None or t is None:
+            return None
+        return self._adaptive.grams.coefficients(t, X, Y)
+
+    def price_to_tolerance(self, target_se, max_paths, initial_paths=None, growth=2., seed=123):
+        """ Values the contract on growing path sets until the standard error is at most target_se
+        target_se : float : requested standard error of the price
+        max_paths : int : path budget, the last round uses at most this many paths
+            (with Sobol sampling every round adds scrambles * 2^k paths, rounded down)
+        initial_paths : int : paths of the first round, default simulations
+        growth : float : factor by which the path count grows each round
+        seed : int : seed of the path batches (ignored for a provided price matrix, whose columns are used in order)
+        returns AdaptiveEstimate(price, standard_error, paths); the standard error is above target_se
+        only when the budget ran out
+        """
+        assert target_se > 0 and max_paths > 0 and growth > 1
+        provided = None if self.providedPrice_matrix is None else open_prices(self.providedPrice_matrix)
+        if provided is not None:
+            max_paths = min(int(max_paths), provided.shape[1])
+        paths = min(int(initial_paths or self.simulations), int(max_paths))
+        sobol = provided is None and self.sampling == 'sobol'
+        if sobol:
+            paths = sobol_path_count(paths, self.scrambles, up=False)   # <-------- every round adds whole power-of-two batches
+            if paths == 0:
+                raise ValueError('Error: Sobol sampling needs at least {} paths'.format(self.scrambles))
+        streams = np.random.SeedSequence(seed)
+        state = _AdaptivePaths(self.deg)
+        try:
+            while True:
+                if provided is not None:
+                    state.prices = provided[:, :paths]
+                    state.groups = np.arange(paths)
+                else:
+                    start = 0 if state.prices is None else state.prices.shape[1]
+                    batch = simulate_paths(self._path_model(), self.T, self.M, paths - start, rng=np.random.default_rng(streams.spawn(1)[0]),
+                                           sampling=self.sampling, batches=self.scrambles)
+                    groups = path_groups(paths - start, self.sampling, batches=self.scrambles)
+                    if state.prices is None:
+                        state.prices, state.groups = batch, groups
+                    else:
+                        state.prices = np.concatenate((state.prices, batch), axis=1)
+                        state.groups = np.concatenate((state.groups, groups + state.groups.max() + 1))
+                self.invalidate()
+                self._adaptive = state
+                solution = self.solve()
+                if solution.standard_error <= target_se or paths >= max_paths:
+                    return AdaptiveEstimate(solution.price, solution.standard_error, paths)
+                grown = min(int(np.ceil(paths*growth)), int(max_paths))
+                if sobol:
+                    grown = paths + sobol_path_count(grown - paths, self.scrambles, up=False)
+                    if grown == paths:
+                        return AdaptiveEstimate(solution.price, solution.standard_error, paths)
+                paths = grown
+        finally:
+            self._adaptive = None
+            self.invalidate()
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""Solution caching, price loading and continuation regressions shared by the engines
+
+LSMCEngine holds what the storage and swing engines have in common around their
+backward inductions: the solution kept until a contract parameter changes, the price
+matrix (simulated, provided or grown by price_to_tolerance), and the multi-target
+regression of every time step with its fitted values. An engine mixes it in first
+and provides
+
+    _contract_parameters                        contract and path attributes, whose assignment drops the solution
+    _solution_type                              namedtuple (value, policy, price, standard_error, coefficients)
+    _setup()                                    derived grids
+    _backward_induction()                       (value, policy) of all states, filling self.coefficients
+    _initial_state(), _policy_values()          state the contract starts in, policy values to trace
+"""
+
+import numpy as np
+from .pricepaths import GBM, simulate_paths
+from .streaming import polynomial_values
+from .tracing import LSMCTrace
+from .pathstore import open_prices
+
+
+class LSMCEngine(object):
+    """ Common part of the LSMC engines, see the module docstring """
+
+    _solve_parameters = ('tracing', 'sampling', 'scrambles', 'control_variate', 'regression')   # <-------- read by solve(), not keyed
+
+    def __setattr__(self, name, value):
+        if name == 'trace' and isinstance(value, bool):
+            name = 'tracing'   # <-------- engine.trace = True switches tracing on, like the constructor argument
+        object.__setattr__(self, name, value)
+        if name in self._contract_parameters or name in self._solve_parameters:
+            self.invalidate()
+
+    def invalidate(self):
+        """Drop the cached solution"""
+        self.__dict__.pop('_solution', None)
+
+    def solve(self):
+        """Runs the backward induction once and returns the cached solution"""
+        solution = self.__dict__.get('_solution')
+        if solution is None:
+            self._setup()
+            self.trace = LSMCTrace(self._policy_values()) if self.tracing else None
+            Value, policy = self._backward_induction()
+            price, standard_error = self._estimate(Value[self._initial_state(),:])
+            solution = self._solution_type(Value, policy, price, standard_error, self.coefficients)
+            self._solution = solution
+        return solution
+
+    @property
+    def value_vector(self):
+        solution = self.solve()
+        return solution.value, solution.policy
+
+    @property
+    def price(self):
+        return self.solve().price
+
+    @property
+    def standard_error(self):
+        return self.solve().standard_error
+
+    @property
+    def optimalPolicy(self):
+        return self.solve().policy
+
+    def MCprice_matrix(self, seed = 123):
+        """ Returns MC price matrix rows: time columns: price-path simulation
+        simulated from price_model, GBM(S0, gamma, sigma) with antithetic shocks by default, or scrambled Sobol shocks """
+        return simulate_paths(self._path_model(), self.T, self.M, self.simulations, seed=seed,
+                              sampling=self.sampling, batches=self.scrambles)
+
+    def _path_model(self):
+        return self.price_model if self.price_model is not None else GBM(self.S0, self.gamma, self.sigma)
+
+    def _load_prices(self):
+        """Sets self.MCprices from the provided matrix or a fresh simulation.
+        Path stores and memory-mapped matrices are used in place, without copies (row 0 is never read)"""
+        if self._adaptive is not None:
+            self.MCprices = self._adaptive.prices
+        elif self.providedPrice_matrix is None:
+            self.MCprices = self.MCprice_matrix()
+        else:
+            self.MCprices = open_prices(self.providedPrice_matrix)
+
+    def _regression_coefficients(self, X, Y, t=None):
+        """Regresses every row of Y on the polynomial basis of X with a single factorization.
+        Same scaling and cut-off as np.polyfit, so each row matches polyfit/polyval on its own.
+        t : time step, lets price_to_tolerance reuse the Gram matrices of earlier path batches
+        With a regression the fit uses its basis and solver instead."""
+        if self.regression is not None:
+            coefficients = self.regression.coefficients(t, X, Y)
+            self._condition = self.regression.condition(t)
+            return coefficients
+        coefficients = self._adaptive_coefficients(t, X, Y)
+        if coefficients is not None:
+            self._condition = np.nan
+            return coefficients
+        A = np.vander(X, self.deg + 1)
+        scale = np.sqrt((A*A).sum(axis=0))
+        coefficients, _, _, singular = np.linalg.lstsq(A/scale, Y.T, rcond=len(X)*np.finfo(A.dtype).eps)
+        self._condition = singular[0]/singular[-1] if singular[-1] > 0 else np.inf
+        return (coefficients.T/scale).T
+
+    def _continuation(self, t, X, coefficients):
+        """Fitted values (targets, n) of the regression coefficients of time step t at the prices X"""
+        if self.regression is not None:
+            return self.regression.values(t, X, coefficients)
+        return polynomial_values(coefficients, X)
+
+    def _basis_size(self):
+        return self.deg + 1 if self.regression is None else self.regression.basis.size
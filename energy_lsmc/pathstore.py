@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""Binary price path store
+
+Scenario files such as rt_hb_north_paths.csv (one scenario per row, one time step per
+column) are converted once into a time-major binary array that is opened memory-mapped:
+
+    magic   8 bytes   b'LSMCPATH'
+    length  8 bytes   little-endian size of the header
+    header  JSON      {"version", "dtype", "shape": [M+1, simulations], "layout", ...}, space padded
+    data              C-ordered (M+1, simulations) array, starting on a 64-byte boundary
+
+Opening a store only reads the header, the prices are paged in on demand and the page
+cache is shared by every process that maps the same file.
+
+    store = PathStore.from_csv('rt_hb_north_paths.csv')   # converts on first use
+    P = store.subset(idx_sim)
+"""
+
+import json
+import os
+import struct
+import time
+import numpy as np
+
+MAGIC = b'LSMCPATH'
+VERSION = 1
+ALIGNMENT = 64
+
+
+def _write_header(f, header):
+    """ Writes magic, length and JSON header, returns the offset of the data """
+    text = json.dumps(header, sort_keys=True).encode('utf-8')
+    start = len(MAGIC) + 8
+    padding = -(start + len(text)) % ALIGNMENT
+    text += b' ' * padding
+    f.write(MAGIC)
+    f.write(struct.pack('<Q', len(text)))
+    f.write(text)
+    return start + len(text)
+
+
+def _read_header(filename):
+    with open(filename, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError('Error: {} is not a path store'.format(filename))
+        length, = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(length).decode('utf-8'))
+    if header.get('version') != VERSION:
+        raise ValueError('Error: unsupported path store version {}'.format(header.get('version')))
+    return header, len(MAGIC) + 8 + length
+
+
+def _create(filename, shape, dtype, metadata):
+    """ Allocates a store on disk and returns a writable memmap of its data """
+    dtype = np.dtype(dtype)
+    header = dict(metadata or {})
+    header.update(version=VERSION, dtype=dtype.str, shape=[int(n) for n in shape], layout='time-major',
+                  created=time.strftime('%Y-%m-%dT%H:%M:%S'))
+    with open(filename, 'wb') as f:
+        offset = _write_header(f, header)
+        f.truncate(offset + dtype.itemsize*int(np.prod(shape)))
+    return np.memmap(filename, dtype=dtype, mode='r+', offset=offset, shape=tuple(shape))
+
+
+def write_store(filename, prices, metadata=None):
+    """ Saves a (M+1, simulations) price matrix as a path store """
+    prices = np.asarray(prices)
+    data = _create(filename, prices.shape, prices.dtype if prices.dtype.kind == 'f' else np.float64, metadata)
+    data[:] = prices
+    data.flush()
+    return PathStore(filename)
+
+
+def _count_rows(csv_path):
+    with open(csv_path, 'rb') as f:
+        return sum(1 for line in f if line.strip()) - 1   # <-------- header row
+
+
+def convert_csv(csv_path, store_path, dtype=np.float64, chunksize=10000, metadata=None):
+    """ One-time conversion of a scenario CSV (rows: scenarios, columns: time steps, one header row)
+    into a time-major path store, read in chunks of `chunksize` scenarios """
+    import pandas as pd
+    simulations = _count_rows(csv_path)
+    if simulations < 1:
+        raise ValueError('Error: {} holds no scenarios'.format(csv_path))
+    meta = {'source': os.path.basename(csv_path)}
+    meta.update(metadata or {})
+    data = None
+    start = 0
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize, float_precision='round_trip'):   # <-------- the exact values written
+        values = chunk.to_numpy(dtype=dtype)
+        if data is None:
+            meta['columns'] = [str(c) for c in chunk.columns]
+            data = _create(store_path, (values.shape[1], simulations), dtype, meta)
+        data[:, start:start + values.shape[0]] = values.T
+        start += values.shape[0]
+    data.flush()
+    return PathStore(store_path)
+
+
+class PathStore(object):
+    """ Read-only, memory-mapped price paths
+    filename : str : path store written by convert_csv or write_store
+    prices : np.memmap : (M+1, simulations) prices rows: time columns: price-path simulation
+    metadata : dict : header of the store
+    The store can be passed as providedPrice_matrix of the LSMC engines, no copy is made.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.metadata, offset = _read_header(filename)
+        self.prices = np.memmap(filename, dtype=np.dtype(self.metadata['dtype']), mode='r', offset=offset,
+                                shape=tuple(self.metadata['shape']))
+
+    @classmethod
+    def from_csv(cls, csv_path, store_path=None, **kwargs):
+        """ Opens the store next to csv_path, converting the CSV first when the store is missing or older """
+        if store_path is None:
+            store_path = os.path.splitext(csv_path)[0] + '.paths'
+        if not os.path.exists(store_path) or os.path.getmtime(store_path) < os.path.getmtime(csv_path):
+            return convert_csv(csv_path, store_path, **kwargs)
+        return cls(store_path)
+
+    @property
+    def shape(self):
+        return self.prices.shape
+
+    @property
+    def steps(self):
+        return self.prices.shape[0]-1
+
+    @property
+    def simulations(self):
+        return self.prices.shape[1]
+
+    def __array__(self, dtype=None, copy=None):
+        return self.prices if dtype is None else self.prices.astype(dtype)
+
+    def subset(self, scenarios):
+        """ (M+1, len(scenarios)) prices of the given scenario columns """
+        return self.prices[:, np.asarray(scenarios)]
+
+    def sample(self, n, seed=None, replace=True):
+        """ Prices of n randomly drawn scenarios """
+        rng = np.random.default_rng(seed)
+        return self.subset(np.sort(rng.choice(self.simulations, size=n, replace=replace)))
+
+
+def open_prices(source):
+    """ Price matrix of a path store, a .npy file (both memory-mapped) or an array, without copying """
+    if isinstance(source, PathStore):
+        return source.prices
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            magic = f.read(len(MAGIC))
+        if magic == MAGIC:
+            return PathStore(source).prices
+        return np.load(source, mmap_mode='r')
+    return np.asarray(source)
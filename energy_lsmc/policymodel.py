@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""Exported exercise policies and out-of-sample forward valuation
+
+After the backward induction the exercise policy of an engine is fully described by
+its continuation regressions: one polynomial per time step and state. policy_model()
+returns them as a PolicyModel, a (T, deg+1, states) coefficient array that is small
+whatever the number of paths, and can be saved and loaded again. Engines regressing on
+a basis of basis.py also keep the basis and the per-step scaling it was fitted with.
+
+forward_price() applies a policy model to a fresh, independent set of price paths,
+simulated from the price model, or given out-of-sample scenarios for an engine fitted
+on provided paths.
+Every path starts in the initial state and at each time step takes the action whose
+cash flow plus regressed continuation value is highest, following the tie rules of
+the backward induction. Only the continuation values of the states a path can move
+to are evaluated, one polynomial per path and action, so a forward run costs a few
+vector operations per time step and no regression. As the decisions are not fitted
+to the paths they are applied to, the mean discounted cash flow is a lower-bound
+estimate of the contract value, unlike the in-sample price.
+
+    s = StorageLSMC7(..., simulations=10000)
+    model = s.policy_model()
+    lower = s.forward_price(model, simulations=100000)
+    lower.price, lower.standard_error
+"""
+
+from collections import namedtuple
+import numpy as np
+from .pricepaths import path_groups, simulate_paths
+from .pathstore import open_prices
+from .basis import BASES
+
+ForwardEstimate = namedtuple('ForwardEstimate', ['price', 'standard_error', 'paths'])
+
+
+class PolicyModel(object):
+    """ Continuation regressions of a solved engine
+    coefficients : (T, deg+1, states) coefficients at t = 1..T, highest power first, NaN where a state was not regressed
+    basis : basis object the coefficients refer to, default the monomials of np.polyfit
+    scalings : (T, p) scaling parameters of the basis at t = 1..T, see basis.Regression.scalings
+    """
+
+    def __init__(self, coefficients, basis=None, scalings=None):
+        self.coefficients = np.asarray(coefficients, dtype=np.float64)
+        self.basis = basis
+        self.scalings = None if scalings is None else np.asarray(scalings, dtype=np.float64)
+
+    @property
+    def steps(self):
+        return self.coefficients.shape[0]
+
+    @property
+    def deg(self):
+        return self.coefficients.shape[1]-1
+
+    def continuation(self, t, X, states):
+        """ Continuation value at time t of every path, each in its own state
+        X : (n,) prices at t, states : (n,) state index of every path """
+        C = self.coefficients[t-1][:, states]
+        if self.basis is not None:
+            return np.einsum('nk,kn->n', self.basis.design(X, self.scalings[t-1]), C)
+        value = C[0].copy()
+        for c in C[1:]:
+            value *= X
+            value += c
+        return value
+
+    def save(self, filename):
+        """ Saves the coefficients as .npy, with a basis as .npz next to its spec and scalings """
+        if self.basis is None:
+            np.save(filename, self.coefficients)
+        else:
+            spec = self.basis.spec()
+            np.savez(filename, coefficients=self.coefficients, scalings=self.scalings,
+                     basis=spec.pop('basis'), size=list(spec.values())[0])
+
+    @classmethod
+    def load(cls, filename):
+        data = np.load(filename)
+        if not hasattr(data, 'files'):
+            return cls(data)
+        with data:
+            return cls(data['coefficients'], BASES[str(data['basis'])](int(data['size'])), data['scalings'])
+
+
+class ForwardSimulation(object):
+    """ Policy export and forward valuation, mixed into the engines
+    The engine records self.coefficients in its backward induction and provides the hooks
+    _initial_state(), _terminal_value(X) and _forward_step(t, T, X, states, model) -> (cash, states),
+    and for pathwise derivatives _cash_derivative(X, before, after) and _terminal_derivative(X, states),
+    the derivatives of the cash flows by the price.
+    """
+
+    def policy_model(self):
+        """ PolicyModel of the solved contract """
+        coefficients = self.solve().coefficients
+        if self.regression is None:
+            return PolicyModel(coefficients)
+        return PolicyModel(coefficients, self.regression.basis, self.regression.scalings(self.MCprices))
+
+    def forward_price(self, model=None, prices=None, simulations=None, seed=456):
+        """ Lower-bound price of the policy model on independent price paths
+        model : PolicyModel : policy to apply, default the policy of this engine
+        prices : array, PathStore or str : (T+1, n) out-of-sample prices, default simulated from the price
+            model; required when the engine was fitted on providedPrice_matrix, whose paths have no model
+        simulations : int : number of simulated paths, default simulations
+        seed : int : seed of the simulated paths, independent of the fitting paths (seed 123)
+        returns ForwardEstimate(price, standard_error, paths)
+        """
+        from .estimators import standard_error
+        model = self.policy_model() if model is None else model
+        if prices is None:
+            if self.providedPrice_matrix is not None:
+                raise ValueError('Error: the policy was fitted on provided paths, forward_price needs out-of-sample prices')
+            simulations = int(simulations or self.simulations)
+            prices = simulate_paths(self._path_model(), self.T, self.M, simulations, seed=seed,
+                                    sampling=self.sampling, batches=self.scrambles)
+            groups = path_groups(simulations, self.sampling, batches=self.scrambles)
+        else:
+            prices = open_prices(prices)
+            groups = np.arange(prices.shape[1])
+        value = self._forward_values(model, prices)[0]
+        return ForwardEstimate(self.discount*np.mean(value), self.discount*standard_error(value, groups), prices.shape[1])
+
+    def _forward_values(self, model, prices, derivatives=None):
+        """ Cash flows of every path under the policy model, discounted to t = 1
+        derivatives : callable (t, X) -> (k, n) derivatives of the prices X at t by k parameters, optional
+        returns the (n,) values and, with derivatives, their (k, n) pathwise derivatives along the decisions taken
+        """
+        T = prices.shape[0]-1
+        if T != model.steps:
+            raise ValueError('Error: the policy has {} time steps, the prices {}'.format(model.steps, T))
+        self._setup()
+        sims = prices.shape[1]
+        states = np.full(sims, self._initial_state(), dtype=np.intp)
+        value = np.zeros(sims)
+        gradient = None
+        for t in range(1, T+1):
+            X = np.asarray(prices[t,:])
+            cash, after = self._forward_step(t, T, X, states, model)
+            value += self.discount**(t-1)*cash
+            if derivatives is not None:
+                exposure = self.discount**(t-1)*self._cash_derivative(X, states, after)*derivatives(t, X)
+                gradient = exposure if gradient is None else gradient + exposure
+            states = after
+        X = np.asarray(prices[T,:])
+        value += self.discount**T*self._terminal_value(X)[states, np.arange(sims)]
+        if derivatives is not None:
+            gradient += self.discount**T*self._terminal_derivative(X, states)*derivatives(T, X)
+        return value, gradient
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""Portfolio valuation
+
+Values many storage and swing contracts against one set of price paths on all cores.
+The paths are placed in shared memory once (or, for a path store / .npy file, mapped
+by every worker from the same file) and the contracts are spread over a process pool.
+
+    specs = [dict(type='storage', S0=5, T=1, M=576, gamma=0.06, div=0.06, sigma=0.59,
+                  I_max=100, I_min=0, DCQ=10, deg=5),
+             dict(type='swing', S0=1, strike=20, T=1, M=576, gamma=0.06, div=0.06, sigma=0.59,
+                  ACQ=40, DCQ=5, ToP=10, deg=5)]
+    results = value_portfolio(specs, P, processes=8)
+
+A spec holds the constructor arguments of the engine named by its type ('storage',
+'swing') or engine (a class name such as 'StorageLSMC6'); simulations defaults to the
+number of paths. Every contract is solved on its own on the same paths, so results come
+back in input order and do not depend on the number of workers.
+
+With cache='/data/lsmc-cache' (a directory or a ValuationCache) contracts that were
+valued before against the same paths are read from the cache instead of solved, see
+cache.py. The paths are fingerprinted once, in the calling process.
+"""
+
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+from . import storagelsmc, swingoption_lsmc
+from .pathstore import PathStore, open_prices
+from .cache import ValuationCache, fingerprint
+
+ContractValuation = namedtuple('ContractValuation', ['price', 'policy'])
+
+ENGINES = {'storage': storagelsmc.StorageLSMC7,
+           'swing': swingoption_lsmc.SwingOptionsLSMC2}
+
+_paths = None
+_shared = None
+_cache = None
+_fingerprint = None
+
+
+def contract_engine(spec, paths):
+    """ Engine instance for one contract spec valued on paths """
+    spec = dict(spec)
+    kind = spec.pop('type', None)
+    engine = spec.pop('engine', None)
+    if engine is not None:
+        cls = getattr(storagelsmc, engine, None) or getattr(swingoption_lsmc, engine)
+    elif kind in ENGINES:
+        cls = ENGINES[kind]
+    else:
+        raise ValueError('Error: unknown contract type {}'.format(kind))
+    spec.setdefault('simulations', paths.shape[1])
+    return cls(providedPrice_matrix=paths, **spec)
+
+
+def _value(spec, policies):
+    engine = contract_engine(spec, _paths)
+    solution = engine.solve() if _cache is None else _cache.valuate(engine, _fingerprint)
+    policy = np.asarray(solution.policy) if policies else None   # <-------- int8, or int16 for wide SwingOptionsLSMC3 grids
+    return ContractValuation(float(solution.price), policy)
+
+
+def _value_with_policy(spec):
+    return _value(spec, True)
+
+
+def _value_price_only(spec):
+    return _value(spec, False)
+
+
+def _attach_cache(cache, paths):
+    global _cache, _fingerprint
+    _cache, _fingerprint = cache, paths
+
+
+def _attach_shared(name, shape, dtype, cache=None, paths=None):
+    """ Worker initializer: read-only view of the paths in shared memory """
+    global _paths, _shared
+    _attach_cache(cache, paths)
+    _shared = SharedMemory(name=name)
+    _paths = np.ndarray(shape, dtype=dtype, buffer=_shared.buf)
+    _paths.flags.writeable = False
+
+
+def _attach_file(filename, cache=None, paths=None):
+    """ Worker initializer: memory-mapped paths of a path store or .npy file """
+    global _paths
+    _attach_cache(cache, paths)
+    _paths = open_prices(filename)
+
+
+def value_portfolio(specs, paths, processes=None, policies=True, cache=None):
+    """ Values every contract spec on the same price paths
+    specs : list of dict : contract specs, see the module docstring
+    paths : array, PathStore or str : (M+1, simulations) prices, path store or .npy file name
+    processes : int : number of worker processes, default os.cpu_count(); 1 values in this process
+    policies : bool : return the policy of every contract (in the engine's dtype) as well as its price
+    cache : str or ValuationCache : valuation cache directory, None to solve every contract
+    returns a list of ContractValuation(price, policy) in the order of specs
+    """
+    global _paths
+    work = _value_with_policy if policies else _value_price_only
+    processes = min(processes or os.cpu_count() or 1, max(len(specs), 1))
+    filename = paths.filename if isinstance(paths, PathStore) else paths if isinstance(paths, str) else None
+    if isinstance(cache, str):
+        cache = ValuationCache(cache)
+    digest = fingerprint(paths) if cache is not None else None
+
+    if processes == 1:
+        previous = _paths, _cache, _fingerprint
+        _paths = open_prices(paths)
+        _attach_cache(cache, digest)
+        try:
+            return [work(spec) for spec in specs]
+        finally:
+            _paths = previous[0]
+            _attach_cache(*previous[1:])
+
+    if filename is not None:
+        with ProcessPoolExecutor(processes, initializer=_attach_file, initargs=(filename, cache, digest)) as pool:
+            return list(pool.map(work, specs))
+
+    paths = np.ascontiguousarray(paths, dtype=np.float64)
+    shared = SharedMemory(create=True, size=max(paths.nbytes, 1))
+    try:
+        np.ndarray(paths.shape, dtype=paths.dtype, buffer=shared.buf)[:] = paths
+        with ProcessPoolExecutor(processes, initializer=_attach_shared,
+                                 initargs=(shared.name, paths.shape, paths.dtype.str, cache, digest)) as pool:
+            return list(pool.map(work, specs))
+    finally:
+        shared.close()
+        shared.unlink()
@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+"""Price path simulation for the LSMC engines
+
+Price models simulated with numpy.random.Generator. Every model builds the whole
+(M+1) x simulations matrix (rows: time, columns: price-path simulation) from one
+block of standard normal shocks with cumulative sums over the time axis, so there is
+no Python loop over time steps and no global random state.
+
+    model = MeanReverting(S0=30, kappa=20, theta=35, sigma=0.8)
+    P = simulate_paths(model, T=1, M=576, simulations=10000, seed=123)
+
+Workers that each simulate a share of the paths should use spawn_generators, which
+gives statistically independent, reproducible streams.
+
+With sampling='sobol' the shocks come from scrambled Sobol sequences instead, mapped
+onto the time steps with a Brownian bridge so that the first (best distributed)
+Sobol coordinates fix the coarse shape of every path. The paths are drawn as
+`batches` independently scrambled sequences, one after the other along the columns,
+and path_groups() labels them so that a standard error can be computed from the
+spread between the batches (scipy is needed for this mode only). Every batch holds
+the same power-of-two number of points, which keeps the balance of the Sobol points,
+so the number of paths must be batches * 2^k; sobol_path_count() rounds to one.
+"""
+
+import numpy as np
+
+
+def spawn_generators(seed, streams):
+    """ Returns `streams` independent generators derived from one seed """
+    return [np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(streams)]
+
+
+def _ar1(x0, a, innovations):
+    """ Solves x_t = a*x_{t-1} + e_t for all t along axis 0 with cumulative sums.
+    Uses x_t = a^t (x_0 + sum_{s<=t} a^-s e_s), restarted in blocks short enough
+    that a^-s never overflows, or step by step when the process forgets within one step """
+    M = innovations.shape[0]
+    x = np.empty((M + 1,) + innovations.shape[1:])
+    x[0] = x0
+    if a >= 1.:
+        x[1:] = x0 + np.cumsum(innovations, axis=0)
+        return x
+    if a < np.exp(-30.):
+        for t in range(M):   # <-------- a^-1 would overflow (a == 0 when exp(-kappa*dt) underflows)
+            x[t + 1] = a * x[t] + innovations[t]
+        return x
+    block = max(1, int(30. / -np.log(a)))
+    for start in range(0, M, block):
+        e = innovations[start:start + block]
+        powers = (a ** np.arange(1, e.shape[0] + 1)).reshape((-1,) + (1,)*(e.ndim - 1))
+        x[start + 1:start + 1 + e.shape[0]] = powers * (x[start] + np.cumsum(e / powers, axis=0))
+    return x
+
+
+def brownian_bridge(normals):
+    """ Unit-variance increments of Brownian paths on M steps built with a Brownian bridge
+    normals : (M, n) independent standard normals, row 0 sets the end point and the
+    following rows fill in midpoints from the coarsest interval to the finest """
+    M = normals.shape[0]
+    W = np.zeros((M + 1,) + normals.shape[1:])
+    W[M] = np.sqrt(M) * normals[0]
+    k = 1
+    intervals = [(0, M)]
+    while intervals:
+        finer = []
+        for left, right in intervals:
+            if right - left < 2:
+                continue
+            mid = (left + right) // 2
+            W[mid] = ((right - mid) * W[left] + (mid - left) * W[right]) / (right - left) \
+                + np.sqrt((mid - left) * (right - mid) / float(right - left)) * normals[k]
+            k += 1
+            finer += [(left, mid), (mid, right)]
+        intervals = finer
+    return np.diff(W, axis=0)
+
+
+def sobol_shocks(M, simulations, rng, batches=16, columns=None):
+    """ (M, simulations) standard normal shocks from `batches` independently scrambled Sobol
+    sequences of dimension M, batch after batch along the columns, with Brownian-bridge ordering
+    columns : slice : draw only these columns of the matrix, from the same points (e.g. block by block) """
+    from scipy.stats import qmc
+    from scipy.special import ndtri
+    start, stop = (0, int(simulations)) if columns is None else (columns.start, columns.stop)
+    blocks = []
+    first = 0
+    for n, seed in zip(_batch_sizes(simulations, batches), rng.integers(2**63, size=batches)):
+        low, high = max(start, first), min(stop, first + n)
+        if low < high:
+            sequence = qmc.Sobol(int(M), scramble=True, seed=np.random.default_rng(seed))
+            if low > first:
+                sequence.fast_forward(low - first)
+            u = sequence.random(high - low)
+            blocks.append(ndtri(np.maximum(u, np.finfo(u.dtype).eps)).T)   # <-------- a scrambled point can be exactly 0
+        first += n
+    return brownian_bridge(np.concatenate(blocks, axis=1))
+
+
+def sobol_path_count(simulations, batches=16, up=True):
+    """ Nearest valid number of Sobol paths batches * 2^k at or above (up) or at or below simulations,
+    0 when rounding down fewer than `batches` paths """
+    simulations, batches = int(simulations), int(batches)
+    if simulations < batches:
+        return batches if up else 0
+    k = int(np.log2(simulations // batches))
+    count = batches * 2**k
+    return count * 2 if up and count < simulations else count
+
+
+def _batch_sizes(simulations, batches):
+    """ Points of each Sobol batch, a power of two """
+    if sobol_path_count(simulations, batches) != int(simulations):
+        raise ValueError('Error: Sobol sampling needs batches * 2^k paths, not {} with {} batches, e.g. {}'
+                         .format(int(simulations), int(batches), sobol_path_count(simulations, batches)))
+    return [int(simulations) // int(batches)] * int(batches)
+
+
+def path_groups(simulations, sampling='pseudo', antithetic=True, batches=16):
+    """ Labels the columns of simulate_paths by independent group: antithetic pairs,
+    Sobol batches or single paths. Group means are i.i.d., see standard_error in estimators.py """
+    simulations = int(simulations)
+    if sampling == 'sobol':
+        return np.repeat(np.arange(int(batches)), _batch_sizes(simulations, batches))
+    if antithetic:
+        return np.arange(simulations) % ((simulations + 1) // 2)
+    return np.arange(simulations)
+
+
+def lognormal_option_expectations(mean, variance, strike):
+    """ E[(S - K)^+] and E[(K - S)^+] for ln S ~ N(mean, variance), undiscounted (Black 1976) """
+    from scipy.special import ndtr
+    mean = np.asarray(mean, dtype=np.float64)
+    variance = np.asarray(variance, dtype=np.float64)
+    forward = np.exp(mean + variance / 2.)
+    sd = np.sqrt(np.maximum(variance, 1e-300))
+    d1 = (np.log(forward / strike) + variance / 2.) / sd
+    calls = forward * ndtr(d1) - strike * ndtr(d1 - sd)
+    return calls, calls - (forward - strike)
+
+
+class GBM(object):
+    """ Geometric Brownian motion
+    S0 : float : initial price
+    mu : float : drift (the risk-free short rate under the pricing measure)
+    sigma : float : volatility factor in diffusion term
+    """
+
+    def __init__(self, S0, mu, sigma):
+        self.S0 = float(S0)
+        self.mu = float(mu)
+        self.sigma = float(sigma)
+
+    def paths(self, dt, shocks, rng):
+        """ Price matrix driven by the (M, simulations) standard normal shocks """
+        increments = (self.mu - self.sigma ** 2 / 2.) * dt + self.sigma * np.sqrt(dt) * shocks
+        log_paths = np.zeros((shocks.shape[0] + 1, shocks.shape[1]))
+        np.cumsum(increments, axis=0, out=log_paths[1:])
+        return self.S0 * np.exp(log_paths)
+
+    def log_moments(self, times):
+        """ Mean and variance of ln S at the given times """
+        times = np.asarray(times, dtype=np.float64)
+        return np.log(self.S0) + (self.mu - self.sigma ** 2 / 2.) * times, self.sigma ** 2 * times
+
+    def log_delta(self, times):
+        """ d ln S_t / d ln S0 at the given times """
+        return np.ones_like(np.asarray(times, dtype=np.float64))
+
+    def log_vega(self, X, time):
+        """ d ln S_t / d sigma of the prices X at time t, on the same random numbers """
+        W = (np.log(X / self.S0) - (self.mu - self.sigma ** 2 / 2.) * time) / self.sigma
+        return W - self.sigma * time
+
+
+class MeanReverting(object):
+    """ One-factor mean-reverting log-price model (Schwartz 1997)
+    d ln S = kappa (ln theta - ln S) dt + sigma dW
+    S0 : float : initial price
+    kappa : float : speed of mean reversion (per year)
+    theta : float : long-run price level
+    sigma : float : volatility of the log price
+    """
+
+    def __init__(self, S0, kappa, theta, sigma):
+        assert S0 > 0 and theta > 0 and kappa >= 0 and sigma >= 0
+        self.S0 = float(S0)
+        self.kappa = float(kappa)
+        self.theta = float(theta)
+        self.sigma = float(sigma)
+
+    def _log_deviation(self, dt, shocks):
+        """ ln S - ln theta, exact discretization of the Ornstein-Uhlenbeck process """
+        a = np.exp(-self.kappa * dt)
+        if self.kappa > 0:
+            scale = self.sigma * np.sqrt((1. - a ** 2) / (2. * self.kappa))
+        else:
+            scale = self.sigma * np.sqrt(dt)
+        return _ar1(np.log(self.S0 / self.theta), a, scale * shocks)
+
+    def paths(self, dt, shocks, rng):
+        """ Price matrix driven by the (M, simulations) standard normal shocks """
+        return self.theta * np.exp(self._log_deviation(dt, shocks))
+
+    def log_moments(self, times):
+        """ Mean and variance of ln S at the given times """
+        times = np.asarray(times, dtype=np.float64)
+        a = np.exp(-self.kappa * times)
+        if self.kappa > 0:
+            variance = self.sigma ** 2 * (1. - a ** 2) / (2. * self.kappa)
+        else:
+            variance = self.sigma ** 2 * times
+        return np.log(self.theta) + a * np.log(self.S0 / self.theta), variance
+
+    def log_delta(self, times):
+        """ d ln S_t / d ln S0 at the given times """
+        return np.exp(-self.kappa * np.asarray(times, dtype=np.float64))
+
+    def log_vega(self, X, time):
+        """ d ln S_t / d sigma of the prices X at time t, on the same random numbers """
+        return (np.log(X) - self.log_moments(time)[0]) / self.sigma
+
+
+class SpikeJump(MeanReverting):
+    """ Mean-reverting log price plus a spike factor (Geman & Roncoroni 2006 style)
+    ln S = ln theta + X + Y, X as in MeanReverting, Y a fast-reverting jump process
+    dY = -spike_reversion Y dt + J dN, N Poisson with intensity jump_intensity,
+    J exponentially distributed with mean jump_mean (in log-price units)
+    S0, kappa, theta, sigma : see MeanReverting
+    jump_intensity : float : expected number of spikes per year
+    jump_mean : float : mean spike size in log-price units
+    spike_reversion : float : speed at which spikes decay (per year)
+    """
+
+    def __init__(self, S0, kappa, theta, sigma, jump_intensity, jump_mean, spike_reversion):
+        MeanReverting.__init__(self, S0, kappa, theta, sigma)
+        assert jump_intensity >= 0 and jump_mean >= 0 and spike_reversion >= 0
+        self.jump_intensity = float(jump_intensity)
+        self.jump_mean = float(jump_mean)
+        self.spike_reversion = float(spike_reversion)
+
+    log_moments = None   # <-------- spikes make the price non-lognormal, no analytic option prices
+    log_vega = None      # <-------- the diffusive part of a path cannot be told apart from its spikes
+
+    def paths(self, dt, shocks, rng):
+        """ Price matrix driven by the normal shocks, spikes drawn from rng """
+        counts = rng.poisson(self.jump_intensity * dt, size=shocks.shape)
+        # a sum of n exponential jumps is Gamma(n) distributed; zero counts give zero jumps
+        jumps = np.where(counts > 0, rng.standard_gamma(np.maximum(counts, 1)), 0.) * self.jump_mean
+        spikes = _ar1(0., np.exp(-self.spike_reversion * dt), jumps)
+        return self.theta * np.exp(self._log_deviation(dt, shocks) + spikes)
+
+
+def simulate_paths(model, T, M, simulations, seed=123, antithetic=True, rng=None, sampling='pseudo', batches=16):
+    """ Returns the (M+1, simulations) price matrix rows: time columns: price-path simulation
+    model : GBM, MeanReverting, SpikeJump or any object with paths(dt, shocks, rng)
+    T : float : time to maturity (in year fractions)
+    M : int : number of time steps
+    simulations : int : number of paths, odd counts are fine with antithetic shocks
+    seed : int : seed of the generator, ignored when rng is given
+    antithetic : bool : pair every shock with its negative (pseudo-random sampling only)
+    rng : numpy.random.Generator : stream to draw from, e.g. one of spawn_generators()
+    sampling : str : 'pseudo' for pseudo-random shocks, 'sobol' for scrambled Sobol shocks with a Brownian bridge
+    batches : int : number of independently scrambled Sobol sequences
+    """
+    assert T > 0 and M > 0 and simulations > 0
+    if sampling not in ('pseudo', 'sobol'):
+        raise ValueError('Error: unknown sampling {}'.format(sampling))
+    if rng is None:
+        rng = np.random.default_rng(seed)
+    dt = float(T) / M
+    if sampling == 'sobol':
+        shocks = sobol_shocks(M, simulations, rng, batches)
+    elif antithetic:
+        shocks = rng.standard_normal((int(M), (int(simulations) + 1) // 2))
+        shocks = np.concatenate((shocks, -shocks), axis=1)[:, :int(simulations)]
+    else:
+        shocks = rng.standard_normal((int(M), int(simulations)))
+    return model.paths(dt, shocks, rng)
@@ -0,0 +1,519 @@
+# -*- coding: utf-8 -*-
+"""Local valuation service for intraday repricing
+
+A long-lived asyncio server that values storage and swing contracts on path sets it
+keeps in memory, so a repricing request costs a backward induction and not a process
+start, a CSV read and a path load:
+
+    python -m energy_lsmc.server --paths north=rt_hb_north_paths.paths --port 8765
+    python -m energy_lsmc.server --paths north=rt_hb_north_paths.csv --unix /tmp/valuate.sock
+
+    with ValuationClient(('127.0.0.1', 8765)) as client:
+        client.valuate(dict(type='storage', S0=5, T=1, M=576, gamma=0.06, div=0.06, sigma=0.59,
+                            I_max=100, I_min=0, DCQ=10, deg=5), paths='north')
+        client.metrics()
+
+A request names a path set given with --paths and a contract spec as in portfolio.py.
+Only the configured path sets are served; with --allow-files (allow_files=True) a request
+may also name any scenario CSV, path store or .npy file the server can read, loaded on
+first use, a CSV being converted to a path store next to it. Path sets are held in
+RAM, the least recently used beyond max_path_sets is dropped. For every path set and
+basis the server keeps one basis.Regression with cache=True, so the design matrices and
+their factorizations are built once per path set and reused by every contract valued
+on it. Contracts regress on monomials of their deg solved by QR unless the
+request names a basis and solver; prices agree with the engines' default np.polyfit fit
+up to rounding.
+
+Requests on the same path set that arrive within batch_window seconds of each other are
+combined into one batch (up to max_batch): identical contracts are solved once, and the
+batch runs as one job on the warm prices and factorizations. The distinct contracts of a
+batch are solved one after the other. They share the per-step factorizations, so a
+regression costs only the products with its own targets, but the targets of different
+contracts are not stacked into one multi-right-hand-side solve, which would need their
+backward inductions to run in lockstep. Batches of different path sets run in parallel
+on a thread pool. With a cache (see cache.py) contracts valued
+before on the same paths are read from disk.
+
+Two protocols share one listening socket:
+
+    JSON lines   one request object per line, answered by one line each, in completion
+                 order and matched by "id"; several requests may be in flight per connection
+                 {"id": 1, "op": "valuate", "paths": "north", "contract": {...}, "basis": "chebyshev", "solver": "qr"}
+                 {"id": 2, "op": "metrics"}
+    HTTP/1.1     POST /valuate with a request object as body, GET /metrics, GET /health
+
+The metrics report requests, errors, batches and their sizes, contracts solved, cache
+hits, the current and highest queue depth (requests waiting for a batch) and the
+latency percentiles of the last 1024 requests. Everything runs locally, the client needs
+nothing beyond the standard library.
+"""
+
+import argparse
+import asyncio
+import json
+import socket
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+
+class _PathSet(object):
+    """ Prices, warm regressions and pending requests of one path set """
+
+    def __init__(self, source):
+        self.source = source
+        self.prices = None
+        self.digest = None
+        self.regressions = {}
+        self.pending = []
+        self.ready = None   # <-------- the event and the batching task belong to the server's event loop
+        self.task = None
+        self.busy = False
+
+
+class _Metrics(object):
+
+    def __init__(self, window=1024):
+        self.started = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched = 0
+        self.solved = 0
+        self.cache_hits = 0
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.latencies = deque(maxlen=window)
+
+    def snapshot(self, path_sets):
+        latencies = np.array(self.latencies) * 1e3
+        percentiles = dict(('latency_p%d_ms' % q, float(np.percentile(latencies, q)) if latencies.size else None)
+                           for q in (50, 90, 99))
+        result = {'uptime_s': time.time() - self.started, 'requests': self.requests, 'errors': self.errors,
+                  'batches': self.batches, 'mean_batch_size': self.batched / float(self.batches) if self.batches else None,
+                  'contracts_solved': self.solved, 'cache_hits': self.cache_hits,
+                  'queue_depth': self.queue_depth, 'max_queue_depth': self.max_queue_depth,
+                  'latency_max_ms': float(latencies.max()) if latencies.size else None,
+                  'path_sets': dict((p.source, {'queue_depth': len(p.pending), 'loaded': p.prices is not None,
+                                                'regressions': len(p.regressions)}) for p in path_sets)}
+        result.update(percentiles)
+        return result
+
+
+class ValuationServer(object):
+    """ Batching valuation service
+    paths : dict : path set name -> scenario CSV, path store or .npy file (array values are used as they are)
+    allow_files : bool : also serve path sets named by a file name, not only the configured names
+    cache : str or ValuationCache : valuation cache directory, None to solve every contract
+    batch_window : float : seconds a request waits for others on the same path set
+    max_batch : int : most requests valued in one batch
+    max_path_sets : int : path sets kept in memory
+    workers : int : threads valuing batches of different path sets
+    """
+
+    def __init__(self, paths=None, cache=None, batch_window=0.005, max_batch=64, max_path_sets=4, workers=2,
+                 allow_files=False):
+        from .cache import ValuationCache
+        assert batch_window >= 0 and max_batch > 0 and max_path_sets > 0 and workers > 0
+        self.paths = dict(paths or {})
+        self.allow_files = bool(allow_files)
+        self.cache = ValuationCache(cache) if isinstance(cache, str) else cache
+        self.batch_window = float(batch_window)
+        self.max_batch = int(max_batch)
+        self.max_path_sets = int(max_path_sets)
+        self.metrics = _Metrics()
+        self._executor = ThreadPoolExecutor(workers)
+        self._path_sets = OrderedDict()
+        self._servers = []
+        self._loop = None
+        self._thread = None
+
+    # ------------------------------------------------------------------ requests
+
+    async def handle(self, request):
+        """ Answer to one request object, errors included as {"error": message} """
+        op = request.get('op', 'valuate')
+        answer = {'id': request.get('id')}
+        try:
+            if op == 'valuate':
+                answer.update(await self.valuate(request))
+            elif op == 'metrics':
+                answer.update(self.metrics.snapshot(self._path_sets.values()))
+            elif op == 'ping':
+                answer['ok'] = True
+            else:
+                raise ValueError('Error: unknown op {}'.format(op))
+        except (ValueError, TypeError, KeyError, OSError) as error:
+            self.metrics.errors += 1
+            answer['error'] = str(error)
+        return answer
+
+    async def valuate(self, request):
+        """ Values request['contract'] on the path set request['paths'] in the next batch of that path set
+        returns {'price', 'standard_error', 'batch', 'latency_ms'} """
+        if not isinstance(request.get('contract'), dict):
+            raise ValueError('Error: a valuation request needs a contract object')
+        started = time.perf_counter()
+        self.metrics.requests += 1
+        path_set = self._path_set(request.get('paths'))
+        future = asyncio.get_running_loop().create_future()
+        path_set.pending.append((request, future))
+        path_set.ready.set()
+        self._queued(1)
+        try:
+            answer = await future
+        finally:
+            self.metrics.latencies.append(time.perf_counter() - started)
+        answer['latency_ms'] = (time.perf_counter() - started) * 1e3
+        return answer
+
+    def _queued(self, n):
+        self.metrics.queue_depth += n
+        self.metrics.max_queue_depth = max(self.metrics.max_queue_depth, self.metrics.queue_depth)
+
+    def _path_set(self, name):
+        if name is None:
+            raise ValueError('Error: a valuation request needs paths')
+        if name in self.paths:
+            source = self.paths[name]
+        elif self.allow_files and isinstance(name, str):
+            source = name
+        else:
+            raise ValueError('Error: unknown path set {}'.format(name))
+        key = source if isinstance(source, str) else name
+        path_set = self._path_sets.get(key)
+        if path_set is None:
+            path_set = self._path_sets[key] = _PathSet(key)
+            path_set.prices = None if isinstance(source, str) else np.ascontiguousarray(source, dtype=np.float64)
+        if path_set.task is None:
+            path_set.ready = asyncio.Event()
+            path_set.task = asyncio.ensure_future(self._batches(path_set, source))
+        self._path_sets.move_to_end(key)
+        self._evict()
+        return path_set
+
+    def _evict(self):
+        """ Drops the least recently used idle path sets beyond max_path_sets, never the most recent one """
+        for key in list(self._path_sets)[:-1]:
+            if len(self._path_sets) <= self.max_path_sets:
+                break
+            path_set = self._path_sets[key]
+            if not path_set.pending and not path_set.busy:
+                if path_set.task is not None:
+                    path_set.task.cancel()
+                del self._path_sets[key]
+
+    # ------------------------------------------------------------------ batches
+
+    async def _batches(self, path_set, source):
+        """ Collects the requests of a path set into batches and values them, one batch at a time """
+        loop = asyncio.get_running_loop()
+        while True:
+            await path_set.ready.wait()
+            await asyncio.sleep(self.batch_window)
+            batch = path_set.pending[:self.max_batch]
+            del path_set.pending[:self.max_batch]
+            if not path_set.pending:
+                path_set.ready.clear()
+            self._queued(-len(batch))
+            path_set.busy = True
+            try:
+                if path_set.prices is None:
+                    await loop.run_in_executor(self._executor, self._load, path_set, source)
+                results, solved, hits = await loop.run_in_executor(self._executor, self._value_batch, path_set,
+                                                                   [request for request, _ in batch])
+            except Exception as error:   # <-------- e.g. unreadable paths: every request of the batch fails
+                results, solved, hits = [ValueError(str(error))] * len(batch), 0, 0
+            finally:
+                path_set.busy = False
+            self.metrics.batches += 1
+            self.metrics.batched += len(batch)
+            self.metrics.solved += solved
+            self.metrics.cache_hits += hits
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(dict(result, batch=len(batch)))
+            if path_set.prices is None and not path_set.pending:
+                self._path_sets.pop(path_set.source, None)   # <-------- paths failed to load, retried on the next request
+                path_set.task = None
+                return
+
+    def _load(self, path_set, source):
+        from .pathstore import PathStore, open_prices
+        from .cache import fingerprint
+        if source.lower().endswith('.csv'):
+            source = PathStore.from_csv(source).filename
+        path_set.digest = fingerprint(source) if self.cache is not None else None
+        path_set.prices = np.ascontiguousarray(open_prices(source), dtype=np.float64)
+
+    def _value_batch(self, path_set, requests):
+        """ Values the contracts of one batch on the warm prices, identical requests once (worker thread)
+        returns the result or exception of every request, the number of backward inductions run and of cache hits """
+        from .cache import fingerprint
+        if self.cache is not None and path_set.digest is None:
+            path_set.digest = fingerprint(path_set.prices)
+        results, distinct, solved = [], {}, 0
+        for request in requests:
+            key = json.dumps([request.get('contract'), request.get('basis'), request.get('solver')], sort_keys=True, default=str)
+            if key not in distinct:
+                try:
+                    distinct[key], ran = self._value_contract(path_set, request)
+                    solved += ran
+                except Exception as error:   # <-------- a bad contract fails its own requests, not the batch
+                    distinct[key] = ValueError(str(error) or type(error).__name__)
+            results.append(distinct[key])
+        hits = sum(not isinstance(r, Exception) for r in distinct.values()) - solved if self.cache is not None else 0
+        return results, solved, hits
+
+    def _value_contract(self, path_set, request):
+        from .basis import BASES, Regression
+        from .portfolio import contract_engine
+        spec = dict(request['contract'])
+        basis = request.get('basis', 'monomial')
+        solver = request.get('solver', 'qr')
+        size = int(spec.get('deg', 5))
+        regression_key = (basis, size, solver)
+        regression = path_set.regressions.get(regression_key)
+        if regression is None:
+            if basis not in BASES:
+                raise ValueError('Error: unknown basis {}'.format(basis))
+            regression = path_set.regressions[regression_key] = Regression(BASES[basis](size), solver, cache=True)
+        spec['regression'] = regression
+        engine = contract_engine(spec, path_set.prices)
+        result = engine.solve() if self.cache is None else self.cache.valuate(engine, path_set.digest)
+        ran = '_solution' in engine.__dict__   # <-------- False for a cache hit
+        return {'price': float(result.price), 'standard_error': float(result.standard_error), 'engine': type(engine).__name__}, ran
+
+    # ------------------------------------------------------------------ sockets
+
+    async def start(self, host='127.0.0.1', port=8765, unix=None):
+        """ Listens on a unix socket, or on host:port (port 0 picks a free port); returns the address """
+        if unix is not None:
+            server = await asyncio.start_unix_server(self._connection, path=unix)
+            address = unix
+        else:
+            server = await asyncio.start_server(self._connection, host, port)
+            address = server.sockets[0].getsockname()[:2]
+        self._servers.append(server)
+        return address
+
+    def serve(self, host='127.0.0.1', port=8765, unix=None):
+        """ Runs the server in this thread until interrupted """
+        async def run():
+            address = await self.start(host, port, unix)
+            print('valuation server on {}'.format(address), file=sys.stderr)
+            await asyncio.gather(*(s.serve_forever() for s in self._servers))
+        try:
+            asyncio.run(run())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._executor.shutdown()
+
+    def start_in_thread(self, host='127.0.0.1', port=0, unix=None):
+        """ Runs the server on an event loop in a daemon thread, e.g. for tests or a notebook; returns the address """
+        started = threading.Event()
+        address = []
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            address.append(self._loop.run_until_complete(self.start(host, port, unix)))
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name='valuation-server', daemon=True)
+        self._thread.start()
+        started.wait()
+        return address[0]
+
+    def stop(self):
+        """ Stops a server started with start_in_thread """
+        if self._loop is not None:
+            asyncio.run_coroutine_threadsafe(self._close(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._loop = None
+        self._executor.shutdown()
+
+    async def _close(self):
+        for server in self._servers:
+            server.close()
+        tasks = [p.task for p in self._path_sets.values() if p.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._servers = []
+
+    async def _connection(self, reader, writer):
+        try:
+            first = await reader.readline()
+            if first.split(b' ', 1)[0] in (b'GET', b'POST'):
+                await self._http(first, reader, writer)
+            else:
+                await self._json_lines(first, reader, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _json_lines(self, line, reader, writer):
+        pending = set()
+
+        async def answer(line):
+            try:
+                request = json.loads(line.decode('utf-8'))
+                if not isinstance(request, dict):
+                    raise ValueError('Error: a request is a JSON object')
+            except ValueError as error:
+                result = {'id': None, 'error': str(error)}
+            else:
+                result = await self.handle(request)
+            writer.write(json.dumps(result).encode('utf-8') + b'\n')
+            await writer.drain()
+
+        while line:
+            if line.strip():
+                task = asyncio.ensure_future(answer(line))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            line = await reader.readline()
+        if pending:
+            await asyncio.gather(*pending)
+
+    async def _http(self, first, reader, writer):
+        method, target = (first.decode('latin-1').split() + [''])[:2]
+        length = 0
+        while True:
+            header = await reader.readline()
+            if header in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = header.decode('latin-1').partition(':')
+            if name.strip().lower() == 'content-length':
+                try:
+                    length = int(value)
+                except ValueError:
+                    length = -1
+        status = '200 OK'
+        if length < 0:
+            status, result = '400 Bad Request', {'error': 'Error: invalid Content-Length'}
+        elif method == 'GET' and target == '/metrics':
+            result = self.metrics.snapshot(self._path_sets.values())
+        elif method == 'GET' and target == '/health':
+            result = {'ok': True}
+        elif method == 'POST' and target == '/valuate':
+            try:
+                request = json.loads((await reader.readexactly(length)).decode('utf-8'))
+                result = await self.handle(dict(request, op='valuate'))
+            except (ValueError, TypeError) as error:
+                result = {'error': str(error)}
+            if 'error' in result:
+                status = '400 Bad Request'
+        else:
+            status, result = '404 Not Found', {'error': 'Error: no route {} {}'.format(method, target)}
+        body = json.dumps(result).encode('utf-8')
+        writer.write('HTTP/1.1 {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\nConnection: close\r\n\r\n'
+                     .format(status, len(body)).encode('latin-1') + body)
+        await writer.drain()
+
+
+class ValuationClient(object):
+    """ Blocking JSON-lines client of a ValuationServer
+    address : (host, port) or str : TCP address or unix socket path
+    """
+
+    def __init__(self, address=('127.0.0.1', 8765), timeout=600.):
+        if isinstance(address, str):
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        self._socket.connect(address if isinstance(address, str) else tuple(address))
+        self._file = self._socket.makefile('rwb')
+        self._next = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
+
+    def request_many(self, requests):
+        """ Sends all requests before reading the answers, so the server can batch them; answers in request order """
+        ids = []
+        for request in requests:
+            self._next += 1
+            ids.append(self._next)
+            self._file.write(json.dumps(dict(request, id=self._next)).encode('utf-8') + b'\n')
+        self._file.flush()
+        answers = {}
+        while len(answers) < len(ids):
+            line = self._file.readline()
+            if not line:
+                raise ConnectionError('Error: the valuation server closed the connection')
+            answer = json.loads(line.decode('utf-8'))
+            answers[answer['id']] = answer
+        return [answers[i] for i in ids]
+
+    def valuate(self, contract, paths, basis=None, solver=None):
+        """ Price of one contract spec on a path set, raises ValueError with the server's error """
+        return self.valuate_many([contract], paths, basis, solver)[0]
+
+    def valuate_many(self, contracts, paths, basis=None, solver=None):
+        """ Prices of several contract specs on one path set, valued in as few batches as the server allows """
+        options = dict((k, v) for k, v in (('basis', basis), ('solver', solver)) if v is not None)
+        answers = self.request_many([dict(options, op='valuate', paths=paths, contract=c) for c in contracts])
+        for answer in answers:
+            if 'error' in answer:
+                raise ValueError(answer['error'])
+        return answers
+
+    def metrics(self):
+        return self.request_many([{'op': 'metrics'}])[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Local LSMC valuation server')
+    parser.add_argument('--paths', action='append', default=[], metavar='NAME=FILE',
+                        help='named path set (scenario CSV, path store or .npy), loaded at start; repeatable')
+    parser.add_argument('--allow-files', action='store_true',
+                        help='also value on any path file a request names, not only the --paths sets')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help='listen on this unix socket instead of TCP')
+    parser.add_argument('--cache', help='valuation cache directory')
+    parser.add_argument('--batch-window', type=float, default=0.005, help='seconds to collect a batch (default 0.005)')
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--max-path-sets', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args(argv)
+    paths = {}
+    for item in args.paths:
+        name, _, filename = item.partition('=')
+        if not filename:
+            parser.error('--paths takes NAME=FILE')
+        paths[name] = filename
+    server = ValuationServer(paths, args.cache, args.batch_window, args.max_batch, args.max_path_sets, args.workers,
+                             args.allow_files)
+    for name, filename in paths.items():
+        path_set = _PathSet(filename)
+        server._load(path_set, filename)
+        server._path_sets[filename] = path_set
+    server.serve(args.host, args.port, args.unix)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,464 @@
+# -*- coding: utf-8 -*-
+"""StorageLSMC.ipynb
+
+Automatically generated by Colaboratory.
+
+Original file is located at
+    https://colab.research.google.com/drive/1GgWoopDD_3YRv-u33Vc2NDVaaAmWCSLV
+
+## Valuation of Energy Storage
+"""
+
+import logging
+import numpy as np
+from collections import namedtuple
+from .streaming import StreamingLSMC
+from .lsmcengine import LSMCEngine
+from .estimators import VarianceReduction
+from .policymodel import ForwardSimulation
+from .sensitivities import Sensitivities
+
+StorageSolution = namedtuple('StorageSolution', ['value', 'policy', 'price', 'standard_error', 'coefficients'])
+
+class StorageLSMC6(LSMCEngine, VarianceReduction, ForwardSimulation, Sensitivities):
+    """ Class for Energy Storage option pricing using Alexander Boogert & Cyriel De Jong (2008):
+    "Ref."
+    S0 : float : initial stock/index level
+    T : float : time to maturity (in year fractions)
+    M : int : grid or granularity for time (in number of total points)
+    gamma : float : constant risk-free short rate
+    div :    float : dividend yield
+    sigma :  float : volatility factor in diffusion term
+    I_max: int : maximum inventory level
+    I_min : int : minimum inventory level
+    DCQ: int : daily injection/withdrawal contract quantity
+    simulations : int : number of simulated price paths
+    deg : int : degree of the polynomial used in the regression
+    price_given : float : matrix of prices (i.e. historical prices), default is not given, hence, randomly generated using brownian motion
+    price_model : object : price model of pricepaths (GBM, MeanReverting, SpikeJump) used when no price matrix is given, default GBM(S0, gamma, sigma)
+    logg : string : user choice of logging; detailed steps of the algorithms for debugging purposes
+    trace : bool : collect per-step diagnostics (regression coefficients, R^2, decision counts, timing) in self.trace, see tracing.py
+    sampling : str : 'pseudo' antithetic pseudo-random paths, 'sobol' scrambled Sobol paths with a Brownian bridge, see pricepaths.py
+    control_variate : bool : correct the price with the strip of European options on the same paths, see estimators.py
+    regression : basis.Regression : basis and solver of the continuation regressions (deg is then unused), default monomials of degree deg, see basis.py
+
+    The backward induction runs once per parameter set: the result is kept in a
+    StorageSolution and dropped whenever one of the contract parameters (or the
+    price matrix) is re-assigned. Call invalidate() after editing the price matrix in place.
+    """
+
+    _contract_parameters = ('S0', 'T', 'M', 'gamma', 'div', 'sigma', 'I_max', 'I_min', 'DCQ',
+                            'simulations', 'deg', 'providedPrice_matrix', 'price_model', 'sampling', 'control_variate', 'regression')
+    _solution_type = StorageSolution
+
+    def __init__(self, S0, T, M, gamma, div, sigma, I_max, I_min, DCQ, simulations, deg, providedPrice_matrix, logg= None, price_model=None, trace=False,
+                 sampling='pseudo', control_variate=False, regression=None):
+        try:
+            self.S0 = float(S0)
+            # self.strike = float(strike)
+            assert T > 0
+            self.T = float(T)
+            assert M > 0
+            self.M = int(M)
+            assert gamma >= 0
+            self.gamma = float(gamma)
+            assert div >= 0
+            self.div = float(div)
+            assert sigma > 0
+            self.sigma = float(sigma)
+            assert DCQ > 0
+            self.DCQ = int(DCQ)
+            assert I_max > 0
+            self.I_max = int(I_max)
+            assert I_min >= 0
+            self.I_min = int(I_min)
+            assert simulations > 0
+            self.simulations = int(simulations)
+            assert deg > 0
+            self.deg = int(deg)
+            self.providedPrice_matrix = providedPrice_matrix
+            self.price_model = price_model
+            self.logg = logg
+            self.tracing = bool(trace)
+            self.sampling = sampling
+            self.control_variate = bool(control_variate)
+            self.regression = regression
+        except ValueError:
+            logging.error('Error passing Options parameters')
+
+        if S0 < 0 or T <= 0 or M <= 0 or gamma < 0 or div < 0 or sigma < 0 or I_max <=0 or I_min < 0 or DCQ <= 0 or simulations <=0 or deg <= 0:
+            raise ValueError('Error: Negative inputs not allowed')
+        self._check_sampling()
+
+        self._setup()
+
+    def _setup(self):
+        """Derived time and inventory grids"""
+        self.time_unit = self.T / float(self.M)
+        self.discount = 1
+        # np.exp(-self.gamma * self.time_unit)
+        self.actions = [-self.DCQ, 0, self.DCQ]
+        self.inventory_max = int(self.I_max)
+        self.inventory_min = int(self.I_min)
+        self.inventoryGridSpace = np.arange(((self.inventory_max - self.inventory_min)//self.DCQ)+1)
+        self.inventorySpace = np.arange(self.inventory_min, self.inventory_max+1, self.DCQ)
+
+    def payoff(action,inv_level,t):
+        """injection cost or withdrawal revenue @ time = t, inventory = inv_level"""
+        withdraw = -action*self.MCprices[t,:]
+        inject = -action*self.MCprices[t,:]
+        
+        return np.where(action>0, withdraw+self.discount*self.V_copy[inv_level-1,:], inject+self.discount*self.V_copy[inv_level+1,:])
+
+    def _state_count(self):
+        return self.inventoryGridSpace[-1]+1
+
+    def _terminal_value(self, X):
+        """V_{T+1}: 0 for empty storage, -10 for every other level"""
+        Value = np.ones((self._state_count(),X.shape[0]))*-10
+        Value[0,:] = 0
+        return Value
+
+    def _initial_state(self):
+        """Inventory level the contract starts in: empty"""
+        return 0
+
+    def _policy_values(self):
+        """Values the policy takes: -1 withdraw, 0 hold, 1 inject"""
+        return (-1, 0, 1)
+
+    def _choose(self, X, levels, i_max_prev, continuation_up, continuation_hold, continuation_down):
+        """Inject, withdraw and hold masks at prices X for the inventory levels (broadcast against X),
+        given the regressed continuation values after each action; i_max_prev : levels permissible at t+1"""
+        z = -float("inf")
+        can_inject = (levels == 0) | (levels < i_max_prev-1)
+        can_withdraw = levels != 0
+        forced = (levels >= i_max_prev) & (levels != 0)
+
+        val_inj = np.where(can_inject, -self.actions[2]*X + continuation_up, z)
+        val_wdra = np.where(can_withdraw, -self.actions[0]*X + continuation_down, z)
+
+        policy_wdra = forced | ((val_wdra >= val_inj) & (val_wdra > continuation_hold))
+        policy_inj = ~forced & (val_inj > val_wdra) & (val_inj > continuation_hold)
+        policy_hodl = ~forced & (continuation_hold >= val_inj) & (continuation_hold >= val_wdra)
+        return policy_inj, policy_wdra, policy_hodl
+
+    def _forward_step(self, t, T, X, states, model):
+        """Action of every path from its own inventory level at time t under the policy model,
+        returns the cash flows and the next levels"""
+        tau = self.DCQ*np.ceil((T+1)/2)
+        rho = self.DCQ*np.ceil((T+2)/2)
+        i_max_current = self._max_level(t, tau, rho)
+        i_max_prev = self._max_level(t+1, tau, rho) if t < T else 0
+        permissible = states < i_max_current
+        levels = np.where(permissible, states, 0)   # <-------- levels out of reach hold, as in the backward induction
+        up = np.minimum(levels+1, min(i_max_current, self._state_count()-1))
+        down = np.maximum(levels-1, 0)
+        inject, withdraw, hold = self._choose(X, levels, i_max_prev, model.continuation(t, X, up),
+                                              model.continuation(t, X, levels), model.continuation(t, X, down))
+        action = np.where(permissible, inject.astype(np.intp) - withdraw, 0)
+        return -self.DCQ*action*X, states + action
+
+    def _cash_derivative(self, X, before, after):
+        """Derivative of the cash flow by the price: minus the volume injected"""
+        return -self.DCQ*(after - before).astype(np.float64)
+
+    def _terminal_derivative(self, X, states):
+        return np.zeros(X.shape[0])
+
+    def _max_level(self, t, tau, rho):
+        """Number of inventory levels reachable at time t (and still emptiable by maturity)"""
+        return int(max(min((self.inventory_max//self.DCQ)+1, (tau - abs(self.DCQ*t - rho))//self.DCQ), min((self.inventory_max//self.DCQ)+1, (tau - abs(self.DCQ*t - tau))//self.DCQ)))
+
+    def _backward_induction(self):
+        self._load_prices()
+        T = self.MCprices.shape[0]-1
+        sims = self.MCprices.shape[1]
+        self.h = np.zeros((len(self.actions),sims))
+        Value = np.ones((self.inventoryGridSpace[-1]+1,sims))*-10
+        Value[0,:] = 0  # <-------- This is V_{T+1}
+        self.policy = np.zeros((T+1,self.inventoryGridSpace[-1]+1,sims), dtype=np.int8)
+        self.coefficients = np.full((T,self._basis_size(),self.inventoryGridSpace[-1]+1), np.nan)
+
+        tau = self.DCQ*np.ceil((T+1)/2)
+        rho = self.DCQ*np.ceil((T+2)/2)
+        z = -float("inf")
+        infty = np.zeros_like([Value[0,:]])
+        infty[:] = z
+        i_max_prev = 0; i_max_current = 0
+        u_t ='-------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------\n';
+        l_t ='\n-------------------------------------------------------------------------------------------------------------------------------------------------------------------------------------'
+        u_i = '+++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++\n'
+        l_i = '\n+++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++'
+        p_i = '|'
+        logger = logging.getLogger('iteration')
+        if self.logg == 'info':
+          logger.setLevel(level=logging.INFO)
+        elif self.logg == 'debug':
+          logger.setLevel(level=logging.DEBUG)
+        else:
+          logger.setLevel(level=logging.ERROR)
+        for t in range(T, 0 , -1):
+          if self.trace is not None:
+            self.trace.start()
+          V_copy = np.copy(Value)    
+          Value = np.ones((self.inventoryGridSpace[-1]+1,sims))*-10
+          Value[0,:] = 0 
+          
+          i_max_prev = i_max_current
+          i_max_current = self._max_level(t, tau, rho)
+          Inventory_permissible = range(0, i_max_current)
+          Y_t = self.discount*V_copy[:i_max_current+1,:]
+          coefficients = self._regression_coefficients(self.MCprices[t,:], Y_t, t)
+          self.coefficients[t-1,:,:coefficients.shape[1]] = coefficients
+          continuation = self._continuation(t, self.MCprices[t,:], coefficients)
+          logger.info('\n %s t =%s, X =%s%s', u_t, t, self.MCprices[t,:], l_t)
+          for i in Inventory_permissible:  # <-------- only loop over permissible inventory states
+            self.h_inj = np.zeros((len(self.actions),sims))
+            self.h_wdra = np.zeros((len(self.actions),sims))
+            self.h_inj[:] = np.nan
+            self.h_wdra[:] = np.nan
+            X = self.MCprices[t,:]
+            logger.info('\n %s t = %s, and i = %s%s', u_i, t, i, l_i)
+
+            if i == 0:
+              Y_inj = self.discount*V_copy[i+1,:]
+              logger.info(' Y_inject= %s', Y_inj)
+              continuation_value_inj = continuation[i+1]  
+              logger.info(' continuation_inject = %s', continuation_value_inj)
+              self.h_inj[2,:] = -self.actions[2]*self.MCprices[t,:] + continuation_value_inj
+              logger.info(' h_inject = %s', self.h_inj)
+              idx_inj = np.nanargmax(self.h_inj, axis=0)
+              logger.info(' indices_inject = %s', idx_inj)
+              val_inj = np.nanmax(self.h_inj, axis=0)
+              optimal_action_inj = -np.take(self.actions, idx_inj)
+              
+              continuation_value_wdra = infty  
+              logger.info(' continuation_withdraw = %s', continuation_value_wdra)            
+              self.h_wdra[0,:] = -self.actions[0]*self.MCprices[t,:] + continuation_value_wdra
+              idx_wdra = np.nanargmax(self.h_wdra, axis=0)
+              val_wdra = np.nanmax(self.h_wdra, axis=0)
+              optimal_action_wdra = -np.take(self.actions, idx_wdra)
+
+              Y = self.discount*V_copy[i,:]
+              continuation_value_hodl = continuation[i]
+              logger.info(' continuation_hold = %s', continuation_value_hodl)
+              
+              policy_wdra = np.where((val_wdra >= val_inj) & (val_wdra > continuation_value_hodl))
+              policy_inj = np.where(val_inj > continuation_value_hodl)
+              policy_hodl = np.where(continuation_value_hodl >= val_inj)
+              logger.info(' policies = %s, %s, %s', policy_hodl, policy_inj, policy_wdra)
+              self.policy[t,i,policy_wdra] = -1
+              self.policy[t,i,policy_inj] = 1
+              self.policy[t,i,policy_hodl] = 0
+              Value[i,policy_hodl] = Y[policy_hodl]
+              Value[i,policy_wdra] = z
+              Value[i,policy_inj] = optimal_action_inj[policy_inj]* self.MCprices[t,policy_inj] + self.discount*V_copy[i+1,policy_inj]
+              logger.info(' V = %s', Value[i,:])
+            
+            elif (i == i_max_prev-1)&(i!=0):
+              Y_wdra = self.discount*V_copy[i-1,:]
+              logger.info(' Y_withdraw = %s', Y_wdra)
+              continuation_value_wdra = continuation[i-1]
+              logger.info(' continuation_withdraw = %s', continuation_value_wdra)
+              self.h_wdra[0,:] = -self.actions[0]*self.MCprices[t,:] + continuation_value_wdra
+              logger.info(' h_withdraw = %s', self.h_wdra)
+              idx_wdra = np.nanargmax(self.h_wdra, axis=0)
+              logger.info(' indices_withdraw = %s', idx_wdra)
+              val_wdra = np.nanmax(self.h_wdra, axis=0)
+              optimal_action_wdra = -np.take(self.actions, idx_wdra)
+
+              continuation_value_inj = infty  
+              logger.info(' continuation_inject = %s', continuation_value_inj)
+              self.h_inj[2,:] = -self.actions[2]*self.MCprices[t,:] + continuation_value_inj
+              idx_inj = np.nanargmax(self.h_inj, axis=0)
+              val_inj = np.nanmax(self.h_inj, axis=0)
+              optimal_action_inj = -np.take(self.actions, idx_inj)
+
+              Y = self.discount*V_copy[i,:]
+              continuation_value_hodl = continuation[i]
+              logger.info(' continuation_hold = %s', continuation_value_hodl)
+            
+              policy_wdra = np.where((val_wdra >= val_inj) & (val_wdra > continuation_value_hodl))
+              policy_inj = np.where((val_inj > val_wdra) & (val_inj > continuation_value_hodl))
+              policy_hodl = np.where((continuation_value_hodl >= val_inj) & (continuation_value_hodl >= val_wdra))
+              logger.info(' policies = %s, %s, %s', policy_hodl, policy_inj, policy_wdra)
+              self.policy[t,i,policy_wdra] = -1
+              self.policy[t,i,policy_inj] = 1
+              self.policy[t,i,policy_hodl] = 0     
+              Value[i,policy_hodl] = Y[policy_hodl]
+              Value[i,policy_wdra] = optimal_action_wdra[policy_wdra]*self.MCprices[t,policy_wdra] + self.discount*V_copy[i-1,policy_wdra]
+              Value[i,policy_inj] = z
+              logger.info(' V = %s', Value[i,:])
+            
+            elif (i > i_max_prev-1):
+              if logger.isEnabledFor(logging.INFO):
+                logger.info(' policies = %s, %s, %s', np.array([]), np.arange(sims), np.array([]))
+              self.policy[t,i,:] = -1
+              Value[i,:] = -self.actions[0]*self.MCprices[t,:] + self.discount*V_copy[i-1,:]
+              logger.info(' V = %s', Value[i,:])
+            
+            else: 
+              Y_wdra = self.discount*V_copy[i-1,:]
+              logger.info(' Y_withdraw = %s', Y_wdra)
+              continuation_value_wdra = continuation[i-1]
+              logger.info(' continuation_withdraw = %s', continuation_value_wdra)
+              self.h_wdra[0,:] = -self.actions[0]*self.MCprices[t,:] + continuation_value_wdra
+              logger.info(' h_withdraw = %s', self.h_wdra)
+              idx_wdra = np.nanargmax(self.h_wdra, axis=0)
+              logger.info(' indices_withdraw = %s', idx_wdra)
+              val_wdra = np.nanmax(self.h_wdra, axis=0)
+              
+              Y_inj = self.discount*V_copy[i+1,:]
+              logger.info(' Y_inject = %s', Y_inj)
+              continuation_value_inj = continuation[i+1]
+              logger.info(' continuation_inject = %s', continuation_value_inj)
+              self.h_inj[2,:] = -self.actions[2]*self.MCprices[t,:] + continuation_value_inj
+              logger.info(' h_inject = %s', self.h_inj)
+              idx_inj = np.nanargmax(self.h_inj, axis=0)
+              logger.info(' indices_inject = %s', idx_inj)
+              val_inj = np.nanmax(self.h_inj, axis=0)
+
+              Y = self.discount*V_copy[i,:]
+              continuation_value_hodl = continuation[i]
+              logger.info(' continuation_hold = %s', continuation_value_hodl)
+              
+              optimal_action_wdra = -np.take(self.actions, idx_wdra)
+              optimal_action_inj = -np.take(self.actions, idx_inj)
+
+              policy_wdra = np.where((val_wdra >= val_inj) & (val_wdra > continuation_value_hodl))
+              policy_inj = np.where((val_inj > val_wdra) & (val_inj > continuation_value_hodl))
+              policy_hodl = np.where((continuation_value_hodl >= val_inj) & (continuation_value_hodl >= val_wdra))
+              logger.info(' policies = %s, %s, %s', policy_hodl, policy_inj, policy_wdra)
+              self.policy[t,i,policy_wdra] = -1
+              self.policy[t,i,policy_inj] = 1
+              self.policy[t,i,policy_hodl] = 0
+              Value[i,policy_hodl] = Y[policy_hodl]
+              Value[i,policy_wdra] = optimal_action_wdra[policy_wdra]*self.MCprices[t,policy_wdra] + self.discount*V_copy[i-1,policy_wdra]
+              Value[i,policy_inj] = optimal_action_inj[policy_inj]*self.MCprices[t,policy_inj] + self.discount*V_copy[i+1,policy_inj]
+              logger.info(' V = %s', Value[i,:])
+            
+          if self.trace is not None:
+            self.trace.record(t, coefficients, Y_t, continuation, self.policy[t,:i_max_current,:], self._condition)
+          V_copy = np.copy(Value)
+
+        return Value, self.policy[1:,:,:]
+
+
+    def _control_strike(self):
+      """Strike of the option strip used as control variate: S0, the storage spread is driven by moves away from it"""
+      return self.S0
+
+    def optimalPath(self, scenario=None):
+      """Optimal action (1 inject, 0 hold, -1 withdraw) at every time step along the optimal
+      inventory path of a scenario, or of all scenarios at once as a (T, sims) array when scenario is None"""
+      Pi = self.optimalPolicy
+      scenarios = np.arange(Pi.shape[2]) if scenario is None else np.array([scenario])
+      policyOptimalPath = np.zeros((Pi.shape[0], len(scenarios)), dtype=np.int8)
+      pointer = np.zeros(len(scenarios), dtype=np.intp)
+      for t in range(Pi.shape[0]):
+        policyOptimalPath[t] = Pi[t,pointer,scenarios]
+        pointer += policyOptimalPath[t]
+      return policyOptimalPath if scenario is None else policyOptimalPath[:,0]
+
+    
+    def optimalStates(self, scenario=None):
+      """Inventory (T+1) and cash flows (T) along the optimal path of a scenario,
+      or (T+1, sims) and (T, sims) arrays for all scenarios when scenario is None"""
+      path_opt = self.optimalPath(scenario)
+      volume = path_opt.astype(np.float64) * self.DCQ
+      I = np.zeros((path_opt.shape[0]+1,) + path_opt.shape[1:])
+      np.cumsum(volume, axis=0, out=I[1:])
+      prices = self.MCprices[1:path_opt.shape[0]+1]
+      CF = -(prices if scenario is None else prices[:,scenario]) * volume
+      return I, CF
+
+class StorageLSMC7(StorageLSMC6):
+    """ Energy Storage option pricing, same model and inputs as StorageLSMC6.
+    The backward induction is vectorized over the inventory grid: at every time step the
+    inject, withdraw and hold values of all permissible levels are computed as (levels, sims)
+    arrays, with masks at the inventory boundaries instead of per-level branches.
+    Gives the same policy and price as StorageLSMC6.
+    """
+
+    def _decide(self, X, continuation, V_next, i_max_current, i_max_prev):
+        """Optimal decision for every permissible level at one time step
+        X : price at t, continuation : regressed discounted V_{t+1}, V_next : realized V_{t+1}
+        returns the value and policy (1 inject, 0 hold, -1 withdraw) of levels 0..i_max_current-1"""
+        levels = np.arange(i_max_current)
+        up = np.minimum(levels+1, continuation.shape[0]-1)
+        down = np.maximum(levels-1, 0)
+        policy_inj, policy_wdra, policy_hodl = self._choose(X, levels[:,np.newaxis], i_max_prev,
+                                                            continuation[up], continuation[levels], continuation[down])
+
+        Value = np.ones((i_max_current, X.shape[0]))*-10
+        Value[:1] = 0
+        Value = np.where(policy_hodl, self.discount*V_next[levels], Value)
+        Value = np.where(policy_wdra, -self.actions[0]*X + self.discount*V_next[down], Value)
+        Value = np.where(policy_inj, -self.actions[2]*X + self.discount*V_next[up], Value)
+        policy = policy_inj.astype(np.int8) - policy_wdra.astype(np.int8)
+        return Value, policy
+
+    def _backward_induction(self):
+        self._load_prices()
+        T = self.MCprices.shape[0]-1
+        sims = self.MCprices.shape[1]
+        levels = self.inventoryGridSpace[-1]+1
+        Value = np.ones((levels,sims))*-10
+        Value[0,:] = 0  # <-------- This is V_{T+1}
+        self.policy = np.zeros((T+1,levels,sims), dtype=np.int8)
+        self.coefficients = np.full((T,self._basis_size(),levels), np.nan)
+
+        tau = self.DCQ*np.ceil((T+1)/2)
+        rho = self.DCQ*np.ceil((T+2)/2)
+        i_max_current = 0
+        for t in range(T, 0, -1):
+          if self.trace is not None:
+            self.trace.start()
+          i_max_prev = i_max_current
+          i_max_current = self._max_level(t, tau, rho)
+          X = self.MCprices[t,:]
+          Y_t = self.discount*Value[:i_max_current+1,:]
+          coefficients = self._regression_coefficients(X, Y_t, t)
+          self.coefficients[t-1,:,:coefficients.shape[1]] = coefficients
+          continuation = self._continuation(t, X, coefficients)
+          Value_t, self.policy[t,:i_max_current,:] = self._decide(X, continuation, Value, i_max_current, i_max_prev)
+          if self.trace is not None:
+            self.trace.record(t, coefficients, Y_t, continuation, self.policy[t,:i_max_current,:], self._condition)
+          Value = np.ones((levels,sims))*-10
+          Value[0,:] = 0
+          Value[:i_max_current] = Value_t
+
+        return Value, self.policy[1:,:,:]
+
+class StreamingStorageLSMC(StreamingLSMC, StorageLSMC7):
+    """ Out-of-core StorageLSMC7 for path sets that do not fit in RAM (see streaming.py)
+    providedPrice_matrix : str or array : path store or time-major .npy file (opened memory-mapped) or array of prices, None to simulate to disk
+    chunk_size : int : number of paths held in memory at a time
+    workdir : str : directory of the disk-backed value, policy (and simulated price) arrays
+    The regressions use a QR factorization updated chunk by chunk, so prices and policies agree
+    with StorageLSMC7 up to the rounding of the least-squares solve.
+    """
+
+    def __init__(self, S0, T, M, gamma, div, sigma, I_max, I_min, DCQ, simulations, deg, providedPrice_matrix, logg= None, price_model=None,
+                 trace=False, sampling='pseudo', control_variate=False, chunk_size=100000, workdir=None):
+        StorageLSMC7.__init__(self, S0, T, M, gamma, div, sigma, I_max, I_min, DCQ, simulations, deg, providedPrice_matrix, logg, price_model, trace,
+                              sampling, control_variate)
+        assert chunk_size > 0
+        self.chunk_size = int(chunk_size)
+        self.workdir = workdir
+
+    def _regression_rows(self, t, T):
+        tau = self.DCQ*np.ceil((T+1)/2)
+        rho = self.DCQ*np.ceil((T+2)/2)
+        return min(self._max_level(t, tau, rho)+1, self._state_count())
+
+    def _stream_step(self, t, T, X, continuation, V_next):
+        tau = self.DCQ*np.ceil((T+1)/2)
+        rho = self.DCQ*np.ceil((T+2)/2)
+        i_max_current = self._max_level(t, tau, rho)
+        i_max_prev = self._max_level(t+1, tau, rho) if t < T else 0
+        Value = self._terminal_value(X)
+        policy = np.zeros(Value.shape, dtype=np.int8)
+        Value[:i_max_current], policy[:i_max_current] = self._decide(X, continuation, V_next, i_max_current, i_max_prev)
+        return Value, policy
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""Out-of-core LSMC
+
+Backward induction over price paths that do not fit in memory. The price matrix is a
+time-major (M+1, simulations) array on disk (a path store or .npy file opened memory-mapped), and it
+is read in column chunks of chunk_size paths. At every time step the regression is
+built from a QR factorization of the design updated chunk by chunk, so it agrees with
+the in-memory regression on all the paths up to rounding. The value slices V_t and
+V_{t+1} and the int8 policy are disk-backed memmaps in workdir, so memory stays bounded
+by a few (states, chunk_size) blocks however many paths are used. Without a workdir the
+engine makes a temporary directory for a solve and removes it once the solve is done
+(POSIX, where the open memmaps keep the data until they are released), or else when the
+engine is closed or garbage collected. The streaming engines regress on monomials only
+and keep no trace.
+
+Simulated paths are drawn in fixed blocks of PATH_BLOCK paths, each from its own
+stream (Sobol points are taken from the same `batches` sequences as simulate_paths,
+block by block), so the paths, and the prices, do not depend on chunk_size.
+
+StreamingLSMC is mixed into an engine that provides the hooks
+
+    _state_count()                                  number of states (inventory levels, rights)
+    _terminal_value(X)                              V_{T+1} for the prices X at maturity
+    _regression_rows(t, T)                          states 0..k-1 regressed at time t
+    _stream_step(t, T, X, continuation, V_next)     value and policy of all states at t
+"""
+
+import os
+import shutil
+import tempfile
+import weakref
+import numpy as np
+from numpy.lib.format import open_memmap
+from .pricepaths import path_groups, simulate_paths, sobol_shocks, spawn_generators
+from .pathstore import open_prices
+
+PATH_BLOCK = 4096
+
+
+class ChunkedLeastSquares(object):
+    """ Least-squares polynomial regression accumulated chunk by chunk in an updated QR factorization
+    deg : int : degree of the polynomial
+    targets : int : number of regressed rows (right-hand sides)
+    The triangular factor R of the Vandermonde matrix and Q'Y are carried from chunk to chunk, so the
+    solve sees the singular values of the whole design and never forms A'A, whose condition number is
+    the square of that of A. Coefficients are returned highest power first, like np.polyfit, with its
+    column scaling and cut-off.
+    """
+
+    def __init__(self, deg, targets):
+        self.deg = int(deg)
+        self.R = np.zeros((0, self.deg + 1))
+        self.QtY = np.zeros((0, int(targets)))
+        self.norms = np.zeros(self.deg + 1)
+        self.count = 0
+
+    def add(self, X, Y):
+        """ Adds the paths of one chunk, X : (n,) prices, Y : (targets, n) values """
+        A = np.vander(X, self.deg + 1)
+        self.norms += (A*A).sum(axis=0)
+        Q, self.R = np.linalg.qr(np.vstack((self.R, A)))
+        self.QtY = np.dot(Q.T, np.vstack((self.QtY, Y.T)))
+        self.count += X.shape[0]
+
+    def solve(self):
+        """ Coefficients (deg+1, targets) of the least-squares fit of all the chunks added """
+        scale = np.sqrt(self.norms)
+        scale[scale == 0] = 1.
+        coefficients = np.linalg.lstsq(self.R / scale, self.QtY,
+                                       rcond=self.count*np.finfo(self.R.dtype).eps)[0]
+        return coefficients / scale[:, np.newaxis]
+
+
+def polynomial_values(coefficients, X):
+    """ Evaluates the (deg+1, targets) coefficients at X, returns (targets, n) """
+    values = np.empty((coefficients.shape[1], X.shape[0]))
+    values[:] = coefficients[0][:, np.newaxis]
+    for c in coefficients[1:]:
+        values *= X
+        values += c[:, np.newaxis]
+    return values
+
+
+def _blocks(simulations):
+    return [slice(start, min(start + PATH_BLOCK, simulations)) for start in range(0, simulations, PATH_BLOCK)]
+
+
+def simulate_to_disk(model, T, M, simulations, filename, seed=123, sampling='pseudo', batches=16):
+    """ Simulates a time-major .npy price matrix block by block, PATH_BLOCK paths at a time with one
+    independent stream per block (with sampling='sobol' the shocks of a block are its columns of the
+    `batches` scrambled Sobol sequences of all the paths) """
+    simulations = int(simulations)
+    prices = open_memmap(filename, mode='w+', dtype=np.float64, shape=(int(M) + 1, simulations))
+    blocks = _blocks(simulations)
+    for block, rng in zip(blocks, spawn_generators(seed, len(blocks))):
+        n = block.stop - block.start
+        if sampling == 'sobol':
+            shocks = sobol_shocks(M, simulations, np.random.default_rng(seed), batches, columns=block)
+            prices[:, block] = model.paths(float(T) / M, shocks, rng)
+        else:
+            prices[:, block] = simulate_paths(model, T, M, n, rng=rng, sampling=sampling)
+    prices.flush()
+    return np.load(filename, mmap_mode='r')
+
+
+class StreamingLSMC(object):
+    """ Out-of-core backward induction, see the module docstring
+    providedPrice_matrix may be the file name of a path store or of a time-major .npy price matrix
+    chunk_size : int : number of paths held in memory at a time
+    workdir : str : directory of the disk-backed value and policy arrays, default a new temporary directory
+    """
+
+    chunk_size = 100000
+    workdir = None
+    _cleanup = None
+
+    def _directory(self):
+        """ workdir, or a new temporary directory removed with close() or when the engine is collected """
+        if self.workdir is not None:
+            return self.workdir
+        self.close()
+        directory = tempfile.mkdtemp(prefix='lsmc-')
+        self._cleanup = weakref.finalize(self, shutil.rmtree, directory, ignore_errors=True)
+        return directory
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state.pop('_cleanup', None)   # <-------- copies and pickles make their own temporary directory
+        return state
+
+    def close(self):
+        """ Removes the temporary directory of the last solve, if the engine made one """
+        if self._cleanup is not None:
+            self._cleanup()
+            self._cleanup = None
+
+    def _open_prices(self, directory):
+        """ Memory-mapped (or in-memory) price matrix, simulated to disk when none is provided """
+        if self._adaptive is not None:
+            return self._adaptive.prices
+        if self.providedPrice_matrix is None:
+            return simulate_to_disk(self._path_model(), self.T, self.M, self.simulations,
+                                    os.path.join(directory, 'prices.npy'),
+                                    sampling=self.sampling, batches=self.scrambles)
+        return open_prices(self.providedPrice_matrix)
+
+    def _path_groups(self, sims):
+        """ Independent groups of simulate_to_disk paths: Sobol batches, or antithetic pairs block by block """
+        if self._adaptive is not None:
+            return self._adaptive.groups
+        if self.providedPrice_matrix is not None:
+            return np.arange(sims)
+        if self.sampling == 'sobol':
+            return path_groups(sims, 'sobol', batches=self.scrambles)
+        return np.concatenate([path_groups(b.stop - b.start) + b.start for b in _blocks(sims)])
+
+    def _chunks(self, sims):
+        return [slice(start, min(start + self.chunk_size, sims)) for start in range(0, sims, self.chunk_size)]
+
+    def _backward_induction(self):
+        if self.regression is not None or self.tracing:
+            raise ValueError('Error: the streaming engines regress on monomials and keep no trace')
+        directory = self._directory()
+        prices = self._open_prices(directory)
+        self.MCprices = prices
+        T = prices.shape[0]-1
+        sims = prices.shape[1]
+        states = self._state_count()
+        chunks = self._chunks(sims)
+
+        V_next = open_memmap(os.path.join(directory, 'value_next.npy'), mode='w+', dtype=np.float64, shape=(states, sims))
+        V_current = open_memmap(os.path.join(directory, 'value.npy'), mode='w+', dtype=np.float64, shape=(states, sims))
+        policy = open_memmap(os.path.join(directory, 'policy.npy'), mode='w+', dtype=np.int8, shape=(T, states, sims))
+        self.coefficients = np.full((T, self.deg + 1, states), np.nan)
+        for c in chunks:
+          V_next[:, c] = self._terminal_value(np.asarray(prices[T, c]))
+
+        for t in range(T, 0, -1):
+          rows = self._regression_rows(t, T)
+          regression = ChunkedLeastSquares(self.deg, rows)
+          for c in chunks:
+            regression.add(np.asarray(prices[t, c]), self.discount*V_next[:rows, c])
+          coefficients = regression.solve()
+          self.coefficients[t-1, :, :rows] = coefficients
+
+          for c in chunks:
+            X = np.asarray(prices[t, c])
+            Value, policy[t-1, :, c] = self._stream_step(t, T, X, polynomial_values(coefficients, X), V_next[:, c])
+            V_current[:, c] = Value
+          V_next, V_current = V_current, V_next
+
+        V_next.flush()
+        policy.flush()
+        if os.name == 'posix':
+            self.close()   # <-------- unlinked files stay readable through the memmaps until they are released
+        return V_next, policy
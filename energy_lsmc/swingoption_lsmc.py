@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+"""SwingOption_LSMC.ipynb
+
+Automatically generated by Colaboratory.
+
+Original file is located at
+    https://colab.research.google.com/drive/1PIYSlXiS_4AvBklIQtiXTxq3EoRr_hi6
+
+## Valuation of Energy Swing Options
+"""
+
+import logging
+import numpy as np
+from collections import namedtuple
+from .streaming import StreamingLSMC
+from .lsmcengine import LSMCEngine
+from .estimators import VarianceReduction
+from .policymodel import ForwardSimulation
+from .sensitivities import Sensitivities
+
+SwingSolution = namedtuple('SwingSolution', ['value', 'policy', 'price', 'standard_error', 'coefficients'])
+
+class SwingOptionsLSMC2(LSMCEngine, VarianceReduction, ForwardSimulation, Sensitivities):
+    """ Class for Energy swing options pricing using Thanawalla, R.T (2005):
+    "Ref."
+    S0 : float : initial stock/index level
+    strike : float : strike price
+    T : float : time to maturity (in year fractions)
+    M : int : grid or granularity for time (in number of total points)
+    gamma : float : constant risk-free short rate
+    div :    float : dividend yield
+    sigma :  float : volatility factor in diffusion term 
+    ACQ : int : Annual Contract Quantity
+    DCQ : int : Daily Contract Quantity
+    ToP : int : Take-or-Pay quantity
+    simulations : int : number of simulated price paths
+    deg : int : degree of the polynomial used in the regression
+    providedPrice_matrix : float : matrix of prices (rows: time, columns: paths), None to simulate from price_model
+    price_model : object : price model of pricepaths (GBM, MeanReverting, SpikeJump), default GBM(S0, gamma, sigma)
+    trace : bool : collect per-step diagnostics (regression coefficients, R^2, decision counts, timing) in self.trace, see tracing.py
+    sampling : str : 'pseudo' antithetic pseudo-random paths, 'sobol' scrambled Sobol paths with a Brownian bridge, see pricepaths.py
+    control_variate : bool : correct the price with the strip of European options on the same paths, see estimators.py
+    regression : basis.Regression : basis and solver of the continuation regressions (deg is then unused), default monomials of degree deg, see basis.py
+
+    The backward induction runs once per parameter set: the result is kept in a
+    SwingSolution and dropped whenever one of the contract parameters (or the
+    price matrix) is re-assigned. Call invalidate() after editing the price matrix in place.
+    """
+
+    _contract_parameters = ('S0', 'strike', 'T', 'M', 'gamma', 'div', 'sigma', 'ACQ', 'DCQ', 'ToP',
+                            'simulations', 'deg', 'providedPrice_matrix', 'price_model', 'sampling', 'control_variate', 'regression')
+    _solution_type = SwingSolution
+
+    def __init__(self, S0, strike, T, M, gamma, div, sigma, ACQ, DCQ, ToP, simulations, deg, providedPrice_matrix, price_model=None, trace=False,
+                 sampling='pseudo', control_variate=False, regression=None):
+        try:
+            self.S0 = float(S0)
+            self.strike = float(strike)
+            assert T > 0
+            self.T = float(T)
+            assert M > 0
+            self.M = int(M)
+            assert gamma >= 0
+            self.gamma = float(gamma)
+            assert div >= 0
+            self.div = float(div)
+            assert sigma > 0
+            self.sigma = float(sigma)
+            assert ACQ > 0
+            self.ACQ = int(ACQ)
+            assert DCQ > 0
+            self.DCQ = int(DCQ)
+            assert ToP > 0
+            self.ToP = int(ToP)
+            assert simulations > 0
+            self.simulations = int(simulations)
+            assert deg > 0
+            self.deg = int(deg)
+            self.providedPrice_matrix = providedPrice_matrix
+            self.price_model = price_model
+            self.tracing = bool(trace)
+            self.sampling = sampling
+            self.control_variate = bool(control_variate)
+            self.regression = regression
+        except ValueError:
+            print('Error passing Options parameters')
+
+        if S0 < 0 or strike < 0 or T <= 0 or M <= 0 or gamma < 0 or div < 0 or sigma < 0 or ACQ <=0 or DCQ <= 0 or ToP < 0 or simulations <=0 or deg <= 0:
+            raise ValueError('Error: Negative inputs not allowed')
+        self._check_sampling()
+
+        self._setup()
+
+    def _setup(self):
+        """Derived rights, time step and action grid"""
+        self.rights = int(self.ACQ/self.DCQ)
+        self.time_unit = self.T / float(self.M)
+        self.discount = np.exp(-self.gamma * self.time_unit)
+        self.actions = [0, self.DCQ]
+        
+    def _initial_state(self):
+        """State the contract starts in: all rights left"""
+        return self.rights
+
+    def _policy_values(self):
+        """Values the policy takes: -1 exercise, 0 hold"""
+        return (-1, 0)
+
+    def _distinct_coefficients(self, X, Y, t=None):
+        """Regression coefficients of every row of Y, fitting runs of identical rows once
+        (e.g. levels holding more rights than steps left), which also keeps their ties exact"""
+        distinct = np.concatenate(([True], np.any(Y[1:] != Y[:-1], axis=1)))
+        group = np.cumsum(distinct)-1
+        return self._regression_coefficients(X, Y[distinct], t)[:,group]
+
+    def _exercise_value(self, X):
+        """Best payoff of the actions at prices X"""
+        return np.max([np.maximum(a*(X - self.strike), 0) for a in self.actions], axis=0)
+
+    def _terminal_value(self, X):
+        Value = np.zeros((self.rights+1, X.shape[0]))
+        Value[1:] = self._exercise_value(X)  # <-------- Double Check - This is V_{T}
+        return Value
+
+    def _backward_induction(self):
+        """Backward induction, all rights levels of a time step are regressed in one multi-target solve"""
+        self._load_prices()
+        T = self.MCprices.shape[0]-1
+        sims = self.MCprices.shape[1]
+        self.policy = np.zeros((T+1,self.rights+1,sims), dtype=np.int8)
+        self.coefficients = np.full((T,self._basis_size(),self.rights+1), np.nan)
+        Value = self._terminal_value(self.MCprices[-1,:])
+
+        for t in range(T, 0 , -1):
+          if self.trace is not None:
+            self.trace.start()
+          X = self.MCprices[t,:]
+          lowest = max(self.rights-t, 0)   # <-------- lowest level needed, as r-1 of the first reachable level
+          Y_t = self.discount*Value[lowest:]
+          coefficients = self._distinct_coefficients(X, Y_t, t)
+          self.coefficients[t-1,:,lowest:] = coefficients
+          continuation = np.zeros_like(Value)
+          continuation[lowest:] = self._continuation(t, X, coefficients)
+          Value, self.policy[t] = self._decide(t, X, continuation, Value)
+          if self.trace is not None:
+            self.trace.record(t, coefficients, Y_t, continuation[lowest:], self.policy[t,lowest:], self._condition)
+
+        return Value, self.policy[1:,:,:]
+
+
+    def _decide(self, t, X, continuation, V_next):
+        """Exercise decision for every rights level at time t
+        X : price at t, continuation : regressed discounted V_{t+1}, V_next : realized V_{t+1}
+        returns the value and policy (-1 exercise, 0 hold) of levels 0..rights"""
+        lowest = max(self.rights-t+1, 1)   # <-------- r = 0 is worth 0, fewer rights are unreachable at t
+        exercise = self._exercise_value(X)
+        val = exercise + continuation[lowest-1:-1]
+        exercised = val > continuation[lowest:]
+        Value = np.zeros((self.rights+1, X.shape[0]))
+        policy = np.zeros((self.rights+1, X.shape[0]), dtype=np.int8)
+        Value[lowest:] = np.where(exercised, exercise + self.discount*V_next[lowest-1:-1], self.discount*V_next[lowest:])
+        policy[lowest:] = -exercised.astype(np.int8)
+        return Value, policy
+
+    def _forward_step(self, t, T, X, states, model):
+        """Exercise decision of every path from its own rights level at time t under the policy model,
+        returns the cash flows and the rights left"""
+        exercise = self._exercise_value(X)
+        left = states > 0
+        below = np.maximum(states-1, 0)
+        exercised = left & (exercise + model.continuation(t, X, below) > model.continuation(t, X, states))
+        return np.where(exercised, exercise, 0.), states - exercised
+
+    def _cash_derivative(self, X, before, after):
+        """Derivative of the cash flow by the price: DCQ where an in-the-money right is exercised"""
+        return np.where(X > self.strike, float(self.DCQ), 0.)*(before - after)
+
+    def _terminal_derivative(self, X, states):
+        return np.where((X > self.strike) & (states > 0), float(self.DCQ), 0.)
+
+    def _control_strike(self):
+      """Strike of the option strip used as control variate: the contract strike"""
+      return self.strike
+
+class StreamingSwingLSMC(StreamingLSMC, SwingOptionsLSMC2):
+    """ Out-of-core SwingOptionsLSMC2 for path sets that do not fit in RAM (see streaming.py)
+    providedPrice_matrix : str or array : path store or time-major .npy file (opened memory-mapped) or array of prices, None to simulate to disk
+    chunk_size : int : number of paths held in memory at a time
+    workdir : str : directory of the disk-backed value, policy (and simulated price) arrays
+    """
+
+    def __init__(self, S0, strike, T, M, gamma, div, sigma, ACQ, DCQ, ToP, simulations, deg, providedPrice_matrix, price_model=None,
+                 trace=False, sampling='pseudo', control_variate=False, chunk_size=100000, workdir=None):
+        SwingOptionsLSMC2.__init__(self, S0, strike, T, M, gamma, div, sigma, ACQ, DCQ, ToP, simulations, deg, providedPrice_matrix, price_model, trace,
+                                   sampling, control_variate)
+        assert chunk_size > 0
+        self.chunk_size = int(chunk_size)
+        self.workdir = workdir
+
+    def _state_count(self):
+        return self.rights+1
+
+    def _regression_rows(self, t, T):
+        return self.rights+1
+
+    def _stream_step(self, t, T, X, continuation, V_next):
+        return self._decide(t, X, continuation, V_next)
+
+class SwingOptionsLSMC3(SwingOptionsLSMC2):
+    """ Multi-volume swing option: any nomination of an action grid every period, cumulative volume on a grid as state
+    S0, strike, T, M, gamma, div, sigma, simulations, deg, providedPrice_matrix, price_model, trace, sampling, control_variate : as SwingOptionsLSMC2
+    ACQ : int : Annual Contract Quantity, the most volume that can be taken over the contract
+    DCQ : int : Daily Contract Quantity, default nomination grid [0, DCQ]
+    ToP : int : Take-or-Pay quantity, volume below ToP at maturity is charged `penalty` per unit
+    nominations : list : volumes that can be nominated each period, e.g. np.arange(min_dcq, max_dcq+1, step)
+    volume_step : int : spacing of the cumulative volume grid, default the gcd of ACQ and the nominations
+    penalty : float : take-or-pay penalty per unit of shortfall at maturity
+
+    Per time step all nominations x volume states are evaluated as (states, sims) array operations,
+    one slice of the continuation values per nomination. Nominations that would exceed ACQ are not
+    allowed; once no nomination fits the remaining volume nothing more is taken. Cash flows are
+    nomination*(price - strike) and the policy holds the number of volume_step units taken.
+    """
+
+    _contract_parameters = SwingOptionsLSMC2._contract_parameters + ('nominations', 'volume_step', 'penalty')
+
+    def __init__(self, S0, strike, T, M, gamma, div, sigma, ACQ, DCQ, ToP, simulations, deg, providedPrice_matrix, price_model=None,
+                 trace=False, sampling='pseudo', control_variate=False, nominations=None, volume_step=None, penalty=0., regression=None):
+        self.nominations = nominations
+        self.volume_step = volume_step
+        self.penalty = float(penalty)
+        SwingOptionsLSMC2.__init__(self, S0, strike, T, M, gamma, div, sigma, ACQ, DCQ, ToP, simulations, deg, providedPrice_matrix, price_model, trace,
+                                   sampling, control_variate, regression)
+
+    def _setup(self):
+        """Nomination grid and cumulative volume grid"""
+        SwingOptionsLSMC2._setup(self)
+        nominations = [0, self.DCQ] if self.nominations is None else self.nominations
+        self.actions = np.unique(np.asarray(nominations, dtype=np.int64))
+        if self.actions[0] < 0:
+          raise ValueError('Error: Negative nominations not allowed')
+        self.step = int(self.volume_step if self.volume_step is not None else np.gcd.reduce(np.append(self.actions, self.ACQ)))
+        if self.step <= 0 or np.any(self.actions % self.step) or self.ACQ % self.step:
+          raise ValueError('Error: ACQ and nominations must be multiples of volume_step')
+        self.volumeSpace = np.arange(0, self.ACQ+1, self.step)
+        self.shifts = self.actions // self.step
+        self.policy_dtype = np.int8 if self.shifts[-1] <= np.iinfo(np.int8).max else np.int16
+
+    def _terminal_value(self, X):
+        """Take-or-pay penalty on the volume shortfall, V_{T+1}"""
+        shortfall = np.maximum(self.ToP - self.volumeSpace, 0)
+        return np.repeat((-self.penalty*shortfall)[:,np.newaxis], X.shape[0], axis=1).astype(np.float64)
+
+    def _decide(self, t, X, continuation, V_next):
+        """Best nomination for every volume state at time t
+        returns the value and policy (volume_step units taken) of all states"""
+        states = len(self.volumeSpace)
+        z = -float("inf")
+        padding = np.full((self.shifts[-1], X.shape[0]), z)
+        continuation = np.concatenate((continuation, padding))
+        best = np.full((states, X.shape[0]), z)
+        policy = np.zeros((states, X.shape[0]), dtype=self.policy_dtype)
+        for a, shift in zip(self.actions, self.shifts):
+          candidate = a*(X - self.strike) + continuation[shift:shift+states]
+          better = candidate > best
+          np.copyto(best, candidate, where=better)
+          np.copyto(policy, shift, where=better)
+        target = np.arange(states)[:,np.newaxis] + policy   # <-------- stays put where no nomination fits
+        cash = policy*float(self.step)*(X - self.strike)
+        Value = cash + self.discount*np.take_along_axis(V_next, target, axis=0)
+        return Value, policy
+
+    def _forward_step(self, t, T, X, states, model):
+        """Nomination of every path from its own volume state at time t under the policy model,
+        returns the cash flows and the next volume states"""
+        top = len(self.volumeSpace)-1
+        best = np.full(X.shape[0], -float("inf"))
+        taken = np.zeros(X.shape[0], dtype=np.intp)
+        for a, shift in zip(self.actions, self.shifts):
+          target = states + shift
+          candidate = np.where(target <= top, a*(X - self.strike) + model.continuation(t, X, np.minimum(target, top)), -float("inf"))
+          better = candidate > best
+          np.copyto(best, candidate, where=better)
+          np.copyto(taken, shift, where=better)
+        return taken*float(self.step)*(X - self.strike), states + taken
+
+    def _cash_derivative(self, X, before, after):
+        """Derivative of the cash flow by the price: the volume nominated"""
+        return (after - before)*float(self.step)
+
+    def _terminal_derivative(self, X, states):
+        return np.zeros(X.shape[0])
+
+    def _backward_induction(self):
+        """Backward induction over the cumulative volume grid"""
+        self._load_prices()
+        T = self.MCprices.shape[0]-1
+        sims = self.MCprices.shape[1]
+        self.policy = np.zeros((T+1,len(self.volumeSpace),sims), dtype=self.policy_dtype)
+        self.coefficients = np.full((T,self._basis_size(),len(self.volumeSpace)), np.nan)
+        Value = self._terminal_value(self.MCprices[-1,:])
+
+        for t in range(T, 0, -1):
+          if self.trace is not None:
+            self.trace.start()
+          X = self.MCprices[t,:]
+          Y_t = self.discount*Value
+          coefficients = self._distinct_coefficients(X, Y_t, t)
+          self.coefficients[t-1] = coefficients
+          continuation = self._continuation(t, X, coefficients)
+          Value, self.policy[t] = self._decide(t, X, continuation, Value)
+          if self.trace is not None:
+            self.trace.record(t, coefficients, Y_t, continuation, self.policy[t], self._condition)
+
+        return Value, self.policy[1:,:,:]
+
+    def _initial_state(self):
+        """State the contract starts in: no volume taken"""
+        return 0
+
+    def _policy_values(self):
+        """Values the policy takes: volume_step units nominated"""
+        return self.shifts
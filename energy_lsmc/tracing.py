@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""Structured tracing of the LSMC backward induction
+
+Engines built with trace=True keep an LSMCTrace in self.trace after solve(). It records,
+for every time step, the regression coefficients and in-sample R^2 of every regressed
+state, the condition number of the step's regression matrix, the number of paths taking
+each action in every state and the wall time of the step, all as arrays. With tracing
+off the engines skip every call, so the disabled path costs one `is None` test per
+time step.
+
+    s = StorageLSMC7(..., trace=True)
+    s.price
+    diagnostics = s.trace.arrays()
+    diagnostics['r2'][:, 0]     # R^2 of the empty-storage regression over time
+"""
+
+import time
+import numpy as np
+
+
+class LSMCTrace(object):
+    """ Per-step diagnostics of one backward induction
+    actions : sequence : policy values to count, e.g. (-1, 0, 1) for withdraw, hold, inject
+    """
+
+    def __init__(self, actions):
+        self.actions = np.asarray(actions)
+        self.t = []
+        self.seconds = []
+        self.coefficients = []
+        self.r2 = []
+        self.condition = []
+        self.counts = []
+        self._started = None
+
+    def start(self):
+        """ Marks the beginning of a time step """
+        self._started = time.perf_counter()
+
+    def record(self, t, coefficients, Y, continuation, policy, condition=np.nan):
+        """ Closes the time step t
+        coefficients : (basis size, states) regression coefficients, highest power first for monomials
+        Y : (states, sims) regressed values, continuation : (states, sims) fitted values
+        policy : (states, sims) decisions of the step
+        condition : float : condition number of the (column-scaled) regression matrix
+        """
+        self.seconds.append(time.perf_counter() - self._started)
+        self.t.append(t)
+        self.coefficients.append(np.array(coefficients).T)
+        self.condition.append(float(condition))
+        residual = ((Y - continuation)**2).sum(axis=1)
+        total = ((Y - Y.mean(axis=1)[:, np.newaxis])**2).sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.r2.append(np.where(total > 0, 1. - residual/total, np.nan))
+        self.counts.append(np.array([(policy == a).sum(axis=1) for a in self.actions]).T)
+
+    def arrays(self):
+        """ Diagnostics stacked over the time steps, padded with NaN (-1 for counts) where a state was not visited
+        t : (steps,) time index, seconds : (steps,) wall time, condition : (steps,) condition numbers
+        coefficients : (steps, states, basis size), r2 : (steps, states), counts : (steps, states, actions)
+        """
+        steps = len(self.t)
+        states = max([len(r) for r in self.r2] + [len(c) for c in self.counts] + [0])
+        width = max([c.shape[1] for c in self.coefficients] + [0])
+        coefficients = np.full((steps, states, width), np.nan)
+        r2 = np.full((steps, states), np.nan)
+        counts = np.full((steps, states, len(self.actions)), -1, dtype=np.int64)
+        for k in range(steps):
+            coefficients[k, :len(self.coefficients[k]), :] = self.coefficients[k]
+            r2[k, :len(self.r2[k])] = self.r2[k]
+            counts[k, :len(self.counts[k])] = self.counts[k]
+        return {'t': np.array(self.t, dtype=np.int64), 'seconds': np.array(self.seconds), 'condition': np.array(self.condition),
+                'coefficients': coefficients, 'r2': r2, 'counts': counts}
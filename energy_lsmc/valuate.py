@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""Command line valuation of storage and swing contracts
+
+    valuate storage --paths rt_hb_north_paths.csv --scenarios 100 --I-max 100 --DCQ 10 --intrinsic --plot
+    valuate swing --paths rt_hb_north_paths.paths --steps 24 --strike 20 --ACQ 40 --DCQ 5 --ToP 10
+    valuate swing --simulations 16384 --steps 48 --S0 30 --strike 30 --sampling sobol --greeks
+
+--paths takes a scenario CSV (converted once to a path store next to it), a path store
+or a time-major .npy file; without it GBM paths are simulated. A lower bound needs paths
+the policy was not fitted on: fresh simulated ones with --lower-bound N, or out-of-sample
+scenarios with --lower-bound-paths FILE, the only choice with --paths. Everything beyond
+argparse is imported when the command runs, so `valuate --help` and the engine modules
+themselves stay quick to load; matplotlib is only imported for --plot.
+"""
+
+import argparse
+import sys
+
+
+def _parser():
+    parser = argparse.ArgumentParser(prog='valuate', description='LSMC valuation of energy storage and swing contracts')
+    contracts = parser.add_subparsers(dest='contract')
+    contracts.required = True
+
+    common = argparse.ArgumentParser(add_help=False)
+    paths = common.add_argument_group('price paths')
+    paths.add_argument('--paths', help='scenario CSV, path store or .npy price matrix (rows: time), default simulated GBM paths')
+    paths.add_argument('--scenarios', type=int, help='value on this many randomly drawn scenarios of --paths')
+    paths.add_argument('--steps', type=int, help='number of time steps M, default all rows of --paths (576 when simulating)')
+    paths.add_argument('--simulations', type=int, default=10000, help='number of simulated paths (default 10000)')
+    paths.add_argument('--sampling', choices=('pseudo', 'sobol'), default='pseudo', help='simulated path sampling')
+    paths.add_argument('--seed', type=int, default=123, help='seed of the scenario draw')
+    market = common.add_argument_group('market')
+    market.add_argument('--S0', type=float, default=5., help='initial price (default 5)')
+    market.add_argument('--T', type=float, default=1., help='maturity in years (default 1)')
+    market.add_argument('--gamma', type=float, default=0.06, help='risk-free short rate (default 0.06)')
+    market.add_argument('--div', type=float, default=0.06, help='dividend yield (default 0.06)')
+    market.add_argument('--sigma', type=float, default=0.59, help='volatility (default 0.59)')
+    output = common.add_argument_group('output')
+    output.add_argument('--deg', type=int, default=5, help='regression degree, knots of piecewise or bins of local (default 5)')
+    output.add_argument('--basis', choices=('monomial', 'chebyshev', 'laguerre', 'piecewise', 'local'),
+                        help='scaled regression basis, default the raw monomials of np.polyfit')
+    output.add_argument('--solver', choices=('qr', 'cholesky', 'lstsq'), default='qr', help='least-squares solver of --basis (default qr)')
+    output.add_argument('--control-variate', action='store_true', help='correct the price with the European option strip')
+    bounds = output.add_mutually_exclusive_group()
+    bounds.add_argument('--lower-bound', type=int, metavar='N', help='forward-value the policy on N fresh simulated paths (not with --paths)')
+    bounds.add_argument('--lower-bound-paths', metavar='FILE',
+                        help='forward-value the policy on the out-of-sample scenarios of FILE (CSV, path store or .npy)')
+    output.add_argument('--greeks', action='store_true', help='report delta, gamma and vega')
+    output.add_argument('--plot', action='store_true', help='plot the paths and the optimal path of the first scenario')
+
+    storage = contracts.add_parser('storage', parents=[common], help='gas storage (StorageLSMC7)')
+    storage.add_argument('--I-max', type=int, default=100, help='maximum inventory (default 100)')
+    storage.add_argument('--I-min', type=int, default=0, help='minimum inventory (default 0)')
+    storage.add_argument('--DCQ', type=int, default=10, help='daily injection/withdrawal quantity (default 10)')
+    storage.add_argument('--intrinsic', action='store_true', help='also value the mean path and report the extrinsic value')
+
+    swing = contracts.add_parser('swing', parents=[common], help='swing option (SwingOptionsLSMC2)')
+    swing.add_argument('--strike', type=float, default=20., help='strike price (default 20)')
+    swing.add_argument('--ACQ', type=int, default=40, help='annual contract quantity (default 40)')
+    swing.add_argument('--DCQ', type=int, default=5, help='daily contract quantity (default 5)')
+    swing.add_argument('--ToP', type=int, default=10, help='take-or-pay quantity (default 10)')
+    return parser
+
+
+def _open_paths(filename, steps):
+    """ Price matrix of a scenario CSV (converted once to a path store), path store or .npy file, cut to steps """
+    from .pathstore import PathStore, open_prices
+    if filename.lower().endswith('.csv'):
+        prices = PathStore.from_csv(filename).prices
+    else:
+        prices = open_prices(filename)
+    return prices if steps is None else prices[:steps+1]
+
+
+def _load_paths(args):
+    """ Price matrix of --paths, cut to --steps and --scenarios, None to simulate """
+    import numpy as np
+    if args.paths is None:
+        return None
+    prices = _open_paths(args.paths, args.steps)
+    if args.scenarios is not None:
+        rng = np.random.default_rng(args.seed)
+        prices = prices[:, np.sort(rng.choice(prices.shape[1], size=args.scenarios, replace=True))]
+    return prices
+
+
+def _engine(args, prices, **overrides):
+    if args.contract == 'storage':
+        from .storagelsmc import StorageLSMC7 as Engine
+        contract = (args.I_max, args.I_min, args.DCQ)
+    else:
+        from .swingoption_lsmc import SwingOptionsLSMC2 as Engine
+        contract = (args.ACQ, args.DCQ, args.ToP)
+    M = prices.shape[0]-1 if prices is not None else (args.steps or 576)
+    simulations = prices.shape[1] if prices is not None else _path_count(args, args.simulations)
+    options = dict(sampling=args.sampling, control_variate=args.control_variate)
+    if args.basis is not None:
+        from .basis import BASES, Regression
+        options['regression'] = Regression(BASES[args.basis](args.deg), args.solver)
+    options.update(overrides)
+    market = (args.S0, args.strike) if args.contract == 'swing' else (args.S0,)
+    return Engine(*(market + (args.T, M, args.gamma, args.div, args.sigma) + contract + (simulations, args.deg, prices)), **options)
+
+
+def _path_count(args, simulations):
+    """ simulations, rounded up to whole power-of-two Sobol batches with --sampling sobol """
+    if args.sampling != 'sobol':
+        return simulations
+    from .pricepaths import sobol_path_count
+    count = sobol_path_count(simulations)
+    if count != simulations:
+        print('valuate: Sobol sampling uses {} paths instead of {}'.format(count, simulations), file=sys.stderr)
+    return count
+
+
+def _plot(engine):
+    import matplotlib.pyplot as plt
+    figure, (top, bottom) = plt.subplots(2, 1, sharex=True)
+    top.plot(engine.MCprices[:, :min(engine.MCprices.shape[1], 100)], linewidth=0.5)
+    top.set_ylabel('price')
+    if hasattr(engine, 'optimalStates'):
+        bottom.plot(engine.optimalStates(0)[0])
+        bottom.set_ylabel('inventory, scenario 0')
+    else:
+        bottom.step(range(1, engine.optimalPolicy.shape[0]+1), engine.optimalPolicy[:, engine.rights, 0])
+        bottom.set_ylabel('exercise, all rights left')
+    bottom.set_xlabel('time step')
+    plt.show()
+
+
+def main(argv=None):
+    parser = _parser()
+    args = parser.parse_args(argv)
+    if args.lower_bound and args.paths is not None:
+        parser.error('--lower-bound simulates paths the policy was not fitted on, with --paths give '
+                     'out-of-sample scenarios with --lower-bound-paths')
+    try:
+        return _valuate(args)
+    except (ValueError, OSError) as error:
+        print('valuate: {}'.format(error), file=sys.stderr)
+        return 1
+
+
+def _valuate(args):
+    import numpy as np
+    prices = _load_paths(args)
+    engine = _engine(args, prices)
+    print('{} price {:.6g} (standard error {:.3g})'.format(args.contract, engine.price, engine.standard_error))
+
+    if args.contract == 'storage' and args.intrinsic:
+        mean_path = np.repeat(np.asarray(engine.MCprices).mean(axis=1)[:, np.newaxis], 2, axis=1)
+        intrinsic = _engine(args, mean_path, sampling='pseudo', control_variate=False).price
+        print('intrinsic {:.6g}, extrinsic {:.6g}'.format(intrinsic, engine.price - intrinsic))
+    if args.lower_bound or args.lower_bound_paths:
+        if args.lower_bound_paths:
+            lower = engine.forward_price(prices=_open_paths(args.lower_bound_paths, args.steps))
+        else:
+            lower = engine.forward_price(simulations=_path_count(args, args.lower_bound))
+        print('lower bound {:.6g} (standard error {:.3g}, {} paths)'.format(lower.price, lower.standard_error, lower.paths))
+    if args.greeks:
+        greeks = engine.greeks()
+        for name in ('delta', 'gamma', 'vega'):
+            print('{} {:.6g} (standard error {:.3g})'.format(name, getattr(greeks, name), greeks.standard_errors[name]))
+    if args.plot:
+        _plot(engine)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,9 @@
+import numpy as np
+import pytest
+
+
+@pytest.fixture(scope='session')
+def prices():
+    """ (25, 2000) price matrix shared by the tests, rows: time """
+    rng = np.random.default_rng(0)
+    return 30*np.exp(np.cumsum(rng.normal(0, 0.05, (25, 2000)), axis=0))
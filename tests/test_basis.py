@@ -0,0 +1,49 @@
+import warnings
+
+import numpy as np
+import pytest
+
+from energy_lsmc.basis import Chebyshev, Laguerre, LocalLinear, Monomial, PiecewiseLinear, Regression
+from energy_lsmc.storagelsmc import StorageLSMC7
+from energy_lsmc.swingoption_lsmc import SwingOptionsLSMC2
+
+STORAGE = (30, 1, 24, 0.06, 0.06, 0.59, 100, 0, 10)
+SWING = (30, 30, 1, 24, 0.06, 0.06, 0.59, 40, 5, 10)
+
+
+@pytest.mark.parametrize('solver', ['qr', 'cholesky', 'lstsq'])
+def test_monomial_regression_matches_polyfit(prices, solver):
+    default = StorageLSMC7(*STORAGE + (prices.shape[1], 3, prices))
+    engine = StorageLSMC7(*STORAGE + (prices.shape[1], 3, prices), regression=Regression(Monomial(3), solver))
+    assert np.isclose(engine.price, default.price, rtol=1e-8)
+
+
+@pytest.mark.parametrize('basis', [Chebyshev(5), Laguerre(5), PiecewiseLinear(6), LocalLinear(8)])
+def test_solvers_agree(prices, basis):
+    results = {}
+    for solver in ('qr', 'cholesky', 'lstsq'):
+        engine = SwingOptionsLSMC2(*SWING + (prices.shape[1], 5, prices), regression=Regression(basis, solver), trace=True)
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            results[solver] = engine.price, engine.standard_error
+        condition = engine.trace.arrays()['condition']
+        assert np.all(np.isfinite(condition[~np.isnan(condition)]))
+    assert np.isclose(results['qr'][0], results['lstsq'][0], rtol=1e-8)
+    # the normal equations square the condition number, decisions near the exercise boundary may flip
+    assert abs(results['cholesky'][0] - results['qr'][0]) < results['qr'][1]
+
+
+def test_cached_regression_reuses_factorizations(prices):
+    regression = Regression(Chebyshev(5), cache=True)
+    first = StorageLSMC7(*STORAGE + (prices.shape[1], 5, prices), regression=regression).price
+    steps = dict(regression._steps)
+    second = StorageLSMC7(*STORAGE + (prices.shape[1], 5, prices), regression=regression).price
+    assert first == second
+    assert all(regression._steps[t] is step for t, step in steps.items())
+
+
+def test_scaled_basis_is_better_conditioned(prices):
+    default = StorageLSMC7(*STORAGE + (prices.shape[1], 5, prices), trace=True)
+    scaled = StorageLSMC7(*STORAGE + (prices.shape[1], 5, prices), regression=Regression(Chebyshev(5)), trace=True)
+    default.price, scaled.price
+    assert np.nanmax(scaled.trace.arrays()['condition']) < np.nanmax(default.trace.arrays()['condition'])
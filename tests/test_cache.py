@@ -0,0 +1,92 @@
+import os
+
+import numpy as np
+import pytest
+
+from energy_lsmc import cache as cache_module
+from energy_lsmc.cache import CachedValuation, ValuationCache, contract_key, fingerprint
+from energy_lsmc.storagelsmc import StreamingStorageLSMC
+from energy_lsmc.swingoption_lsmc import SwingOptionsLSMC2
+
+SWING = (30, 30, 1, 24, 0.06, 0.06, 0.59, 40, 5, 10)
+
+
+def record(size, value=0.):
+    """ CachedValuation whose policy makes the stored record roughly `size` bytes """
+    policy = np.random.default_rng(int(value)).integers(-128, 127, size=size, dtype=np.int8)
+    return CachedValuation(value, 0.1, policy, np.zeros((2, 4, 3)))
+
+
+def test_miss_then_hit(prices, tmp_path):
+    cache = ValuationCache(str(tmp_path))
+    engine = SwingOptionsLSMC2(*SWING + (prices.shape[1], 3, prices))
+    first = cache.valuate(engine)
+    engine.solve = None   # <-------- a hit must not solve
+    second = cache.valuate(engine)
+    assert second.price == first.price == SwingOptionsLSMC2(*SWING + (prices.shape[1], 3, prices)).price
+    assert second.policy.dtype == np.int8 and np.array_equal(second.policy, first.policy)
+    assert np.array_equal(second.coefficients, first.coefficients, equal_nan=True)
+
+
+def test_keys(prices, tmp_path):
+    engine = SwingOptionsLSMC2(*SWING + (prices.shape[1], 3, prices))
+    key = contract_key(engine)
+    assert contract_key(SwingOptionsLSMC2(*SWING + (prices.shape[1], 3, prices.copy()))) == key
+    assert contract_key(SwingOptionsLSMC2(30., 30., *SWING[2:] + (prices.shape[1], 3, prices))) == key
+    assert contract_key(SwingOptionsLSMC2(*SWING + (prices.shape[1], 4, prices))) != key
+    changed = prices.copy()
+    changed[5, 7] += 1e-9
+    assert contract_key(SwingOptionsLSMC2(*SWING + (prices.shape[1], 3, changed))) != key
+    filename = str(tmp_path / 'prices.npy')
+    np.save(filename, prices)
+    assert fingerprint(filename) == fingerprint(prices)
+    streaming = [StreamingStorageLSMC(30, 1, 24, 0.06, 0.06, 0.59, 100, 0, 10, 5000, 3, None, chunk_size=size)
+                 for size in (500, 1000)]
+    assert contract_key(streaming[0]) == contract_key(streaming[1])
+
+
+def test_least_recently_used_records_are_evicted(tmp_path):
+    cache = ValuationCache(str(tmp_path), max_bytes=10**9)
+    for k, name in enumerate('abc'):
+        cache.put(name, record(20000, k))
+        os.utime(str(tmp_path / (name + '.npz')), (1000 + k, 1000 + k))
+    size = cache.size()
+    assert cache.get('a').price == 0.   # <-------- a hit makes 'a' the most recently used
+    cache.max_bytes = size
+    cache.put('d', record(20000, 3))
+    assert cache.get('b') is None
+    assert [cache.get(name).price for name in 'acd'] == [0., 2., 3.]
+    assert cache.size() <= size
+
+
+def test_records_are_replaced_atomically(tmp_path):
+    cache = ValuationCache(str(tmp_path))
+    cache.put('a', record(1000, 1))
+    with open(str(tmp_path / 'a.npz'), 'rb') as reader:   # <-------- a reader of the old record
+        cache.put('a', record(1000, 2))
+        with np.load(reader) as old:
+            assert float(old['price']) == 1.
+    assert cache.get('a').price == 2.
+    assert sorted(os.listdir(str(tmp_path))) == ['.lock', 'a.npz']
+
+
+def test_failed_writes_leave_the_record(tmp_path, monkeypatch):
+    cache = ValuationCache(str(tmp_path))
+    cache.put('a', record(1000, 1))
+
+    def fail(*args, **kwargs):
+        raise OSError('disk full')
+    monkeypatch.setattr(cache_module.np, 'savez_compressed', fail)
+    with pytest.raises(OSError):
+        cache.put('a', record(1000, 2))
+    assert cache.get('a').price == 1.
+    assert not [name for name in os.listdir(str(tmp_path)) if name.endswith('.tmp')]
+
+
+def test_unreadable_records_are_misses(tmp_path):
+    cache = ValuationCache(str(tmp_path))
+    with open(str(tmp_path / 'bad.npz'), 'wb') as f:
+        f.write(b'partial')
+    assert cache.get('bad') is None and cache.get('missing') is None
+    cache.clear()
+    assert cache.size() == 0
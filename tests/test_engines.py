@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from energy_lsmc.basis import Chebyshev, Regression
+from energy_lsmc.storagelsmc import StorageLSMC6, StorageLSMC7
+from energy_lsmc.swingoption_lsmc import SwingOptionsLSMC2
+
+STORAGE = (30, 1, 24, 0.06, 0.06, 0.59, 100, 0, 10)
+SWING = dict(S0=30, strike=30, T=1, M=24, gamma=0.06, div=0.06, sigma=0.59, ACQ=40, DCQ=5, ToP=10,
+             simulations=1024, deg=3, providedPrice_matrix=None)
+
+
+def test_storage_engines_agree(prices):
+    old = StorageLSMC6(*STORAGE + (prices.shape[1], 3, prices))
+    new = StorageLSMC7(*STORAGE + (prices.shape[1], 3, prices))
+    assert old.price == new.price
+    assert np.array_equal(old.optimalPolicy, new.optimalPolicy)
+    assert np.array_equal(old.value_vector[0], new.value_vector[0])
+
+
+def test_solution_is_cached():
+    engine = StorageLSMC7(*STORAGE + (1000, 3, None))
+    solution = engine.solve()
+    assert engine.solve() is solution
+    assert engine.price == solution.price and engine.optimalPolicy is solution.policy
+    engine.logg = 'debug'   # <-------- logging only
+    assert engine.solve() is solution
+
+
+@pytest.mark.parametrize('name, value', [('S0', 31.), ('sigma', 0.4), ('deg', 4), ('simulations', 1200),
+                                         ('sampling', 'sobol'), ('control_variate', True),
+                                         ('regression', Regression(Chebyshev(3)))])
+def test_assignment_drops_the_solution(name, value):
+    engine = SwingOptionsLSMC2(**SWING)
+    solution = engine.solve()
+    setattr(engine, name, value)
+    assert engine.solve() is not solution
+    fresh = SwingOptionsLSMC2(**dict(SWING, **{name: value}))
+    assert engine.price == fresh.price and engine.standard_error == fresh.standard_error
+
+
+def test_scrambles_and_tracing_drop_the_solution():
+    engine = StorageLSMC7(*STORAGE + (1024, 3, None), sampling='sobol')
+    error = engine.standard_error
+    engine.scrambles = 8
+    assert engine.standard_error != error
+    assert engine.trace is None
+    engine.trace = True
+    engine.price
+    assert engine.trace.arrays()['t'].size == 24
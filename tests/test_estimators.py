@@ -0,0 +1,135 @@
+import numpy as np
+import pytest
+
+from energy_lsmc.estimators import control_variate, standard_error
+from energy_lsmc.pricepaths import GBM, _batch_sizes, path_groups, simulate_paths, sobol_path_count, sobol_shocks
+from energy_lsmc.storagelsmc import StorageLSMC7
+from energy_lsmc.swingoption_lsmc import SwingOptionsLSMC2
+
+STORAGE = (30, 1, 24, 0.06, 0.06, 0.59, 100, 0, 10)
+SWING = (30, 30, 1, 24, 0.06, 0.06, 0.59, 40, 5, 10)
+
+
+@pytest.mark.parametrize('simulations, up, count', [(1000, True, 1024), (1000, False, 512), (1024, True, 1024),
+                                                    (1024, False, 1024), (5, True, 16), (5, False, 0), (16, False, 16)])
+def test_sobol_path_count(simulations, up, count):
+    assert sobol_path_count(simulations, 16, up=up) == count
+
+
+def test_sobol_batches():
+    assert _batch_sizes(4096, 16) == [256]*16
+    with pytest.raises(ValueError):
+        _batch_sizes(1000, 16)
+    assert np.array_equal(path_groups(64, 'sobol', batches=4), np.repeat(np.arange(4), 16))
+
+
+def test_sobol_columns_are_drawn_from_the_same_points():
+    shocks = sobol_shocks(24, 512, np.random.default_rng(5), batches=4)
+    part = sobol_shocks(24, 512, np.random.default_rng(5), batches=4, columns=slice(128, 320))
+    assert np.allclose(part, shocks[:, 128:320])
+    assert np.isclose(shocks.mean(), 0, atol=0.01) and np.isclose(shocks.std(), 1, atol=0.01)
+
+
+@pytest.mark.parametrize('cls, args', [(StorageLSMC7, STORAGE), (SwingOptionsLSMC2, SWING)])
+def test_engines_reject_invalid_sobol_counts(cls, args):
+    with pytest.raises(ValueError):
+        cls(*args + (1000, 3, None), sampling='sobol')
+    engine = cls(*args + (1024, 3, None), sampling='sobol')
+    assert np.isfinite(engine.price) and engine.MCprices.shape[1] == 1024
+    engine.simulations = 1000
+    with pytest.raises(ValueError):
+        engine.price
+
+
+def test_standard_error_of_groups():
+    values = np.random.default_rng(0).standard_normal(1000)
+    assert np.isclose(standard_error(values, np.arange(1000)), values.std(ddof=1)/np.sqrt(1000))
+    pairs = np.concatenate((values[:500], -values[:500]))
+    assert np.isclose(standard_error(pairs, path_groups(1000)), 0, atol=1e-15)
+
+
+def test_control_variate_removes_the_control():
+    rng = np.random.default_rng(0)
+    controls = rng.standard_normal((1, 5000))
+    values = 3*controls[0] + 0.1*rng.standard_normal(5000)
+    corrected, beta = control_variate(values, controls, [0.])
+    assert np.isclose(beta[0], 3, atol=0.01)
+    assert corrected.std() < 0.11
+
+
+@pytest.mark.parametrize('cls, args', [(StorageLSMC7, STORAGE), (SwingOptionsLSMC2, SWING)])
+def test_control_variate_lowers_the_standard_error(cls, args):
+    plain = cls(*args + (4096, 3, None))
+    controlled = cls(*args + (4096, 3, None), control_variate=True)
+    assert controlled.standard_error < 0.6*plain.standard_error
+    assert abs(controlled.price - plain.price) < 3*plain.standard_error
+
+
+def test_control_variate_needs_simulated_paths(prices):
+    engine = SwingOptionsLSMC2(*SWING + (prices.shape[1], 3, prices), control_variate=True)
+    with pytest.raises(ValueError):
+        engine.price
+
+
+def test_sobol_prices_agree_with_pseudo_random_paths():
+    pseudo = SwingOptionsLSMC2(*SWING + (4096, 3, None))
+    sobol = SwingOptionsLSMC2(*SWING + (4096, 3, None), sampling='sobol')
+    assert sobol.standard_error < pseudo.standard_error
+    assert abs(sobol.price - pseudo.price) < 3*np.hypot(sobol.standard_error, pseudo.standard_error)
+    assert simulate_paths(GBM(30, 0.06, 0.59), 1, 24, 4096, sampling='sobol').shape == (25, 4096)
+
+
+@pytest.fixture(scope='module')
+def paths():
+    return simulate_paths(GBM(30, 0.06, 0.59), 1, 24, 16000, seed=7)
+
+
+@pytest.mark.parametrize('cls, args', [(StorageLSMC7, STORAGE), (SwingOptionsLSMC2, SWING)])
+@pytest.mark.parametrize('deg', [3, 5, 7])
+def test_rounds_match_the_price_on_their_paths(paths, cls, args, deg):
+    estimate = cls(*args + (2000, deg, paths)).price_to_tolerance(1e-9, 16000)
+    engine = cls(*args + (16000, deg, paths))
+    assert estimate.paths == 16000
+    assert np.isclose(estimate.price, engine.price, rtol=1e-12)
+    assert np.isclose(estimate.standard_error, engine.standard_error, rtol=1e-12)
+
+
+def test_stops_at_the_target(paths):
+    errors = {n: SwingOptionsLSMC2(*SWING + (n, 3, paths[:, :n])).standard_error for n in (1000, 2000, 4000, 8000, 16000)}
+    target = errors[4000]
+    stop = next(n for n in sorted(errors) if errors[n] <= target)
+    estimate = SwingOptionsLSMC2(*SWING + (1000, 3, paths)).price_to_tolerance(target, 16000)
+    assert estimate.paths == stop and estimate.standard_error <= target
+    assert estimate.price == SwingOptionsLSMC2(*SWING + (stop, 3, paths[:, :stop])).price
+
+
+def test_respects_the_path_budget(paths):
+    estimate = SwingOptionsLSMC2(*SWING + (1000, 3, paths)).price_to_tolerance(1e-9, 5000)
+    assert estimate.paths == 5000
+    assert estimate.price == SwingOptionsLSMC2(*SWING + (5000, 3, paths[:, :5000])).price
+    assert SwingOptionsLSMC2(*SWING + (1000, 3, paths[:, :300])).price_to_tolerance(1e-9, 5000).paths == 300
+
+
+def test_sobol_rounds_add_whole_batches():
+    rounds = []
+
+    class Recording(SwingOptionsLSMC2):
+        def solve(self):
+            solution = SwingOptionsLSMC2.solve(self)
+            rounds.append((self._adaptive.prices.shape[1], np.bincount(self._adaptive.groups)))
+            return solution
+
+    estimate = Recording(*SWING + (1024, 3, None), sampling='sobol').price_to_tolerance(1e-9, 5000, initial_paths=1000)
+    counts = [n for n, _ in rounds]
+    assert counts[0] == 512 and estimate.paths == counts[-1] <= 5000
+    for previous, (n, sizes) in zip([0] + counts, rounds):
+        assert sobol_path_count(n - previous, 16) == n - previous
+        assert np.all(sizes[-16:] == (n - previous)//16)
+
+
+def test_the_solution_is_dropped_afterwards():
+    engine = SwingOptionsLSMC2(*SWING + (1024, 3, None))
+    price = engine.price
+    estimate = engine.price_to_tolerance(1e-9, 4096)
+    assert estimate.paths == 4096 and estimate.price != price
+    assert engine.price == price and engine.MCprices.shape[1] == 1024
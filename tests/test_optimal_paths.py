@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from energy_lsmc.storagelsmc import StorageLSMC6, StorageLSMC7
+from energy_lsmc.swingoption_lsmc import SwingOptionsLSMC2
+
+STORAGE = (30, 1, 24, 0.06, 0.06, 0.59, 100, 0, 10)
+
+
+def walk(policy, scenario):
+    """ Optimal actions of one scenario, stepping through the policy one time step at a time """
+    actions = np.zeros(policy.shape[0])
+    level = 0
+    for t in range(policy.shape[0]):
+        actions[t] = policy[t, level, scenario]
+        level += int(actions[t])
+    return actions
+
+
+@pytest.fixture(scope='module')
+def storage(prices):
+    return StorageLSMC7(*STORAGE + (prices.shape[1], 3, prices))
+
+
+def test_policies_are_int8(storage, prices):
+    assert storage.optimalPolicy.dtype == np.int8
+    assert StorageLSMC6(*STORAGE + (200, 3, prices[:, :200])).optimalPolicy.dtype == np.int8
+    assert SwingOptionsLSMC2(30, 30, 1, 24, 0.06, 0.06, 0.59, 40, 5, 10, 200, 3, prices[:, :200]).optimalPolicy.dtype == np.int8
+
+
+def test_all_scenarios_match_one_by_one(storage):
+    paths = storage.optimalPath()
+    I, CF = storage.optimalStates()
+    assert paths.shape == (24, 2000) and I.shape == (25, 2000) and CF.shape == (24, 2000)
+    for scenario in (0, 1, 777, 1999):
+        assert np.array_equal(paths[:, scenario], walk(storage.optimalPolicy, scenario))
+        assert np.array_equal(storage.optimalPath(scenario), paths[:, scenario])
+        inventory, cash = storage.optimalStates(scenario)
+        assert np.array_equal(inventory, I[:, scenario]) and np.array_equal(cash, CF[:, scenario])
+
+
+def test_states_follow_the_actions(storage, prices):
+    paths = storage.optimalPath()
+    I, CF = storage.optimalStates()
+    assert np.all(I[0] == 0) and np.all(I[-1] == 0)
+    assert np.all((I >= 0) & (I <= 100))
+    assert np.array_equal(np.diff(I, axis=0), 10*paths)
+    assert np.allclose(CF, -10*paths*prices[1:])
+
+
+def test_cash_flows_give_the_path_values(storage):
+    CF = storage.optimalStates()[1]
+    discounts = storage.discount**np.arange(CF.shape[0])
+    value = storage.solve().value[storage._initial_state()]
+    assert np.allclose(np.dot(discounts, CF), value, rtol=1e-10, atol=1e-9)
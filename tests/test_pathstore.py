@@ -0,0 +1,73 @@
+import os
+
+import numpy as np
+import pytest
+
+from energy_lsmc.pathstore import PathStore, convert_csv, open_prices, write_store
+from energy_lsmc.storagelsmc import StorageLSMC7
+
+
+def write_csv(filename, prices):
+    """ Scenario CSV of a time-major price matrix: one scenario per row, one header row """
+    header = ','.join('t{}'.format(t) for t in range(prices.shape[0]))
+    np.savetxt(filename, prices.T, delimiter=',', header=header, comments='', fmt='%.17g')
+
+
+def test_csv_round_trip(prices, tmp_path):
+    csv = str(tmp_path / 'paths.csv')
+    write_csv(csv, prices)
+    store = convert_csv(csv, str(tmp_path / 'paths.paths'), chunksize=300)
+    assert store.shape == prices.shape and store.steps == 24 and store.simulations == 2000
+    assert np.array_equal(store.prices, prices)
+    assert store.metadata['source'] == 'paths.csv'
+    assert store.metadata['columns'][:2] == ['t0', 't1']
+    assert np.array_equal(store.subset([5, 3]), prices[:, [5, 3]])
+
+
+def test_float32_store(prices, tmp_path):
+    csv = str(tmp_path / 'paths.csv')
+    write_csv(csv, prices)
+    store = convert_csv(csv, str(tmp_path / 'paths.paths'), dtype=np.float32)
+    assert store.prices.dtype == np.float32
+    assert np.array_equal(store.prices, prices.astype(np.float32))
+
+
+def test_from_csv_converts_once(prices, tmp_path):
+    csv = str(tmp_path / 'paths.csv')
+    write_csv(csv, prices)
+    store = PathStore.from_csv(csv)
+    assert store.filename == str(tmp_path / 'paths.paths')
+    created = os.path.getmtime(store.filename)
+    assert np.array_equal(PathStore.from_csv(csv).prices, prices)
+    assert os.path.getmtime(store.filename) == created
+    write_csv(csv, 2*prices)
+    os.utime(csv, (created + 10, created + 10))
+    assert np.array_equal(PathStore.from_csv(csv).prices, 2*prices)
+
+
+def test_open_prices(prices, tmp_path):
+    store = write_store(str(tmp_path / 'paths.paths'), prices, metadata={'hub': 'north'})
+    np.save(str(tmp_path / 'paths.npy'), prices)
+    assert store.metadata['hub'] == 'north'
+    for source in (store, store.filename, str(tmp_path / 'paths.npy'), prices):
+        assert np.array_equal(open_prices(source), prices)
+    assert isinstance(open_prices(store.filename), np.memmap)
+
+
+def test_engines_price_a_store_like_the_array(prices, tmp_path):
+    store = write_store(str(tmp_path / 'paths.paths'), prices)
+    args = (30, 1, 24, 0.06, 0.06, 0.59, 100, 0, 10, prices.shape[1], 3)
+    assert StorageLSMC7(*args + (store.filename,)).price == StorageLSMC7(*args + (prices,)).price
+
+
+def test_invalid_files_raise(tmp_path):
+    other = str(tmp_path / 'other.paths')
+    with open(other, 'wb') as f:
+        f.write(b'not a path store')
+    with pytest.raises(ValueError):
+        PathStore(other)
+    empty = str(tmp_path / 'empty.csv')
+    with open(empty, 'w') as f:
+        f.write('t0,t1\n')
+    with pytest.raises(ValueError):
+        convert_csv(empty, str(tmp_path / 'empty.paths'))
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from energy_lsmc.basis import Chebyshev, Regression
+from energy_lsmc.policymodel import PolicyModel
+from energy_lsmc.pricepaths import MeanReverting
+from energy_lsmc.storagelsmc import StorageLSMC7
+from energy_lsmc.swingoption_lsmc import SwingOptionsLSMC2, SwingOptionsLSMC3
+
+STORAGE = (30, 1, 24, 0.06, 0.06, 0.59, 100, 0, 10)
+SWING = (30, 30, 1, 24, 0.06, 0.06, 0.59, 40, 5, 10)
+
+ENGINES = [
+    lambda: StorageLSMC7(*STORAGE + (4000, 3, None)),
+    lambda: SwingOptionsLSMC2(*SWING + (4000, 3, None)),
+    lambda: SwingOptionsLSMC3(30, 30, 1, 24, 0.06, 0.06, 0.59, 150, 5, 10, 4000, 3, None, nominations=[0, 1, 150]),
+    lambda: StorageLSMC7(*STORAGE + (4000, 3, None), price_model=MeanReverting(30, 5, 35, 0.5),
+                         regression=Regression(Chebyshev(4))),
+]
+
+
+@pytest.mark.parametrize('make', ENGINES)
+def test_forward_run_on_the_fitting_paths_gives_the_in_sample_price(make):
+    engine = make()
+    price = engine.price
+    forward = engine.forward_price(prices=engine.MCprices)
+    assert np.isclose(forward.price, price, rtol=1e-12)
+    assert forward.paths == 4000
+
+
+@pytest.mark.parametrize('make', ENGINES[:2])
+def test_lower_bound_on_fresh_paths(make):
+    engine = make()
+    lower = engine.forward_price(simulations=20000)
+    assert lower.paths == 20000
+    assert lower.price < engine.price + 3*np.hypot(engine.standard_error, lower.standard_error)
+    assert lower.standard_error < engine.standard_error
+
+
+def test_provided_paths_need_out_of_sample_prices(prices):
+    engine = SwingOptionsLSMC2(*SWING + (1000, 3, prices[:, :1000]))
+    with pytest.raises(ValueError):
+        engine.forward_price()
+    lower = engine.forward_price(prices=prices[:, 1000:])
+    assert lower.paths == 1000 and np.isfinite(lower.price)
+    with pytest.raises(ValueError):
+        engine.forward_price(prices=prices[:-1, 1000:])
+
+
+def test_monomial_model_round_trip(tmp_path):
+    engine = SwingOptionsLSMC2(*SWING + (4000, 3, None))
+    model = engine.policy_model()
+    assert model.steps == 24 and model.deg == 3 and model.basis is None
+    filename = str(tmp_path / 'policy.npy')
+    model.save(filename)
+    loaded = PolicyModel.load(filename)
+    assert loaded.basis is None and np.array_equal(loaded.coefficients, model.coefficients, equal_nan=True)
+    assert engine.forward_price(loaded, seed=9) == engine.forward_price(model, seed=9)
+
+
+def test_basis_model_round_trip(tmp_path):
+    engine = ENGINES[3]()
+    model = engine.policy_model()
+    filename = str(tmp_path / 'policy.npz')
+    model.save(filename)
+    loaded = PolicyModel.load(filename)
+    assert isinstance(loaded.basis, Chebyshev) and loaded.basis.size == 5
+    assert np.array_equal(loaded.scalings, model.scalings)
+    assert np.array_equal(loaded.coefficients, model.coefficients, equal_nan=True)
+    X = engine.MCprices[12]
+    states = np.zeros(len(X), dtype=np.intp)
+    assert np.array_equal(loaded.continuation(12, X, states), model.continuation(12, X, states))
+    assert engine.forward_price(loaded, seed=9) == engine.forward_price(model, seed=9)
@@ -0,0 +1,39 @@
+import numpy as np
+
+from energy_lsmc import pathstore
+from energy_lsmc.portfolio import value_portfolio
+
+BASE = dict(S0=30, T=1, M=24, gamma=0.06, div=0.06, sigma=0.59, deg=3)
+SPECS = ([dict(BASE, type='storage', I_max=I_max, I_min=0, DCQ=10) for I_max in (50, 100, 150)] +
+         [dict(BASE, type='swing', strike=strike, ACQ=40, DCQ=5, ToP=10) for strike in (25, 30, 35)] +
+         [dict(BASE, engine='SwingOptionsLSMC3', strike=30, ACQ=150, DCQ=5, ToP=10, nominations=[0, 1, 150])])
+
+
+def _same(results, reference):
+    assert [r.price for r in results] == [r.price for r in reference]
+    for result, expected in zip(results, reference):
+        assert result.policy.dtype == expected.policy.dtype
+        assert np.array_equal(result.policy, expected.policy)
+
+
+def test_results_do_not_depend_on_processes(prices):
+    reference = value_portfolio(SPECS, prices, processes=1)
+    assert reference[-1].policy.dtype == np.int16
+    for processes in (2, 3):
+        _same(value_portfolio(SPECS, prices, processes=processes), reference)
+
+
+def test_path_store_gives_the_same_prices(prices, tmp_path):
+    filename = str(tmp_path / 'prices.paths')
+    pathstore.write_store(filename, prices)
+    reference = value_portfolio(SPECS, prices, processes=1, policies=False)
+    results = value_portfolio(SPECS, filename, processes=2, policies=False)
+    assert [r.price for r in results] == [r.price for r in reference]
+    assert all(r.policy is None for r in results)
+
+
+def test_cache_gives_the_same_results(prices, tmp_path):
+    reference = value_portfolio(SPECS, prices, processes=2)
+    cache = str(tmp_path / 'cache')
+    value_portfolio(SPECS, prices, processes=2, cache=cache)
+    _same(value_portfolio(SPECS, prices, processes=1, cache=cache), reference)
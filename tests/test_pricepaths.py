@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from energy_lsmc.pricepaths import GBM, MeanReverting, SpikeJump, _ar1, path_groups, simulate_paths
+
+
+@pytest.mark.parametrize('a', [0.9, 1e-5, 1e-300, 0.])
+def test_ar1_matches_the_recursion(a):
+    e = np.random.default_rng(1).standard_normal((50, 3))
+    expected = np.empty((51, 3))
+    expected[0] = 0.5
+    for t in range(50):
+        expected[t+1] = a*expected[t] + e[t]
+    assert np.allclose(_ar1(0.5, a, e), expected, rtol=1e-12, atol=1e-12)
+
+
+def test_infinite_mean_reversion_gives_finite_paths():
+    model = MeanReverting(S0=30, kappa=1e6, theta=35, sigma=0.8)
+    P = simulate_paths(model, T=1, M=12, simulations=100)
+    assert np.all(np.isfinite(P))
+    assert np.allclose(P[0], 30)
+    log_std = 0.8/np.sqrt(2e6)
+    assert np.allclose(np.log(P[1:]/35), 0., atol=6*log_std)
+
+
+@pytest.mark.parametrize('model', [MeanReverting(30, 20, 35, 0.8), SpikeJump(30, 20, 35, 0.8, 10, 0.3, 200)])
+def test_mean_reverting_paths(model):
+    P = simulate_paths(model, T=1, M=48, simulations=20000)
+    assert P.shape == (49, 20000)
+    assert np.all(np.isfinite(P)) and np.all(P > 0)
+    assert np.allclose(P[0], 30)
+
+
+def test_mean_reverting_log_moments():
+    model = MeanReverting(30, 5, 35, 0.8)
+    P = simulate_paths(model, T=1, M=24, simulations=40000)
+    mean, variance = model.log_moments([0.5, 1.])
+    logs = np.log(P[[12, 24]])
+    assert np.allclose(logs.mean(axis=1), mean, atol=0.01)
+    assert np.allclose(logs.var(axis=1), variance, rtol=0.03)
+
+
+def test_spikes_only_raise_prices():
+    shocks = np.random.default_rng(2).standard_normal((48, 500))
+    base = MeanReverting(30, 20, 35, 0.8).paths(1./48, shocks, np.random.default_rng(3))
+    spiky = SpikeJump(30, 20, 35, 0.8, 10, 0.3, 200).paths(1./48, shocks, np.random.default_rng(3))
+    assert np.all(spiky >= base) and np.any(spiky > base)
+
+
+@pytest.mark.parametrize('simulations', [1, 5, 101])
+def test_odd_antithetic_counts(simulations):
+    P = simulate_paths(GBM(30, 0.06, 0.59), T=1, M=12, simulations=simulations)
+    assert P.shape == (13, simulations)
+    half = (simulations + 1) // 2
+    increments = np.diff(np.log(P), axis=0) - (0.06 - 0.59**2/2)/12
+    assert np.allclose(increments[:, half:], -increments[:, :simulations - half])
+    groups = path_groups(simulations)
+    assert np.array_equal(groups[half:], np.arange(simulations - half))
+    assert len(np.unique(groups)) == half
@@ -0,0 +1,86 @@
+import copy
+
+import numpy as np
+import pytest
+
+from energy_lsmc.pricepaths import GBM, MeanReverting, simulate_paths
+from energy_lsmc.storagelsmc import StorageLSMC7
+from energy_lsmc.swingoption_lsmc import SwingOptionsLSMC2
+
+
+def storage(S0=30., sigma=0.59, price_model=None, simulations=2000):
+    return StorageLSMC7(S0, 1, 12, 0.06, 0.06, sigma, 100, 0, 10, simulations, 3, None, price_model=price_model)
+
+
+def swing(S0=30., sigma=0.59, price_model=None, simulations=2000):
+    return SwingOptionsLSMC2(S0, 30, 1, 12, 0.06, 0.06, sigma, 40, 5, 10, simulations, 3, None, price_model=price_model)
+
+
+def bumped(model, **changes):
+    model = copy.copy(model)
+    for name, value in changes.items():
+        setattr(model, name, getattr(model, name) + value)
+    return model
+
+
+def test_gbm_storage_gamma_is_zero():
+    # the value of storage under GBM is proportional to S0
+    greeks = storage().greeks()
+    assert abs(greeks.gamma) < 1e-8
+    assert greeks.delta > 0
+
+
+def test_gbm_storage_delta_is_price_over_S0():
+    greeks = storage().greeks()
+    assert np.isclose(greeks.delta, greeks.price/30., rtol=1e-9)
+    assert np.isclose((storage(30.3).price - storage(29.7).price)/0.6, greeks.delta, rtol=1e-9)
+
+
+def test_swing_gamma_matches_revaluation():
+    greeks = swing().greeks(bump=0.05)
+    expected = (swing(31.5).price - 2*swing(30.).price + swing(28.5).price)/1.5**2
+    assert np.isclose(greeks.gamma, expected, rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize('engine', [storage, swing])
+@pytest.mark.parametrize('model', [GBM(30, 0.06, 0.59), MeanReverting(30, 5, 35, 0.5)])
+def test_pathwise_greeks_match_revaluation_with_the_decisions_held(engine, model):
+    # the fitted policy run on paths of the bumped model, with the same random numbers; the bumps
+    # are small enough that no decision changes
+    contract = engine(price_model=model)
+    greeks = contract.greeks()
+    policy = contract.policy_model()
+
+    def value(model):
+        return contract.forward_price(policy, prices=simulate_paths(model, 1, 12, 2000)).price
+    h = 1e-7
+    delta = (value(bumped(model, S0=h*30)) - value(bumped(model, S0=-h*30)))/(2*h*30)
+    vega = (value(bumped(model, sigma=h)) - value(bumped(model, sigma=-h)))/(2*h)
+    assert np.isclose(greeks.delta, delta, rtol=1e-5)
+    assert np.isclose(greeks.vega, vega, rtol=1e-5)
+
+
+@pytest.mark.parametrize('engine', [storage, swing])
+def test_mean_reverting_greeks_match_bump_and_revalue(engine):
+    model = MeanReverting(30, 5, 35, 0.5)
+    greeks = engine(price_model=model, simulations=20000).greeks()
+
+    def price(model):
+        return engine(price_model=model, simulations=20000).price
+    delta = (price(bumped(model, S0=1.5)) - price(bumped(model, S0=-1.5)))/3.
+    vega = (price(bumped(model, sigma=0.025)) - price(bumped(model, sigma=-0.025)))/0.05
+    assert np.isclose(greeks.delta, delta, rtol=0.02)
+    assert np.isclose(greeks.vega, vega, rtol=0.02)
+
+
+def test_mean_reverting_path_derivatives():
+    model = MeanReverting(30, 5, 35, 0.5)
+    times = np.arange(13)/12.
+    P = simulate_paths(model, 1, 12, 1000)
+    h = 1e-6
+    log_delta = (np.log(simulate_paths(bumped(model, S0=h), 1, 12, 1000)) - np.log(P))/np.log1p(h/30)
+    log_vega = (np.log(simulate_paths(bumped(model, sigma=h), 1, 12, 1000))
+                - np.log(simulate_paths(bumped(model, sigma=-h), 1, 12, 1000)))/(2*h)
+    assert np.allclose(log_delta, model.log_delta(times)[:, np.newaxis], rtol=1e-5)
+    for t in (1, 6, 12):
+        assert np.allclose(log_vega[t], model.log_vega(P[t], times[t]), rtol=1e-5, atol=1e-8)
@@ -0,0 +1,101 @@
+import json
+import socket
+import urllib.error
+import urllib.request
+
+import numpy as np
+import pytest
+
+from energy_lsmc.pathstore import write_store
+from energy_lsmc.server import ValuationClient, ValuationServer
+from energy_lsmc.storagelsmc import StorageLSMC7
+
+STORAGE = dict(type='storage', S0=30, T=1, M=24, gamma=0.06, div=0.06, sigma=0.59, I_max=100, I_min=0, DCQ=10, deg=3)
+SWING = dict(type='swing', S0=30, strike=30, T=1, M=24, gamma=0.06, div=0.06, sigma=0.59, ACQ=40, DCQ=5, ToP=10, deg=3)
+
+
+@pytest.fixture
+def store(prices, tmp_path):
+    filename = str(tmp_path / 'north.paths')
+    write_store(filename, prices)
+    return filename
+
+
+@pytest.fixture
+def server(store):
+    server = ValuationServer({'north': store}, batch_window=0.05)
+    address = server.start_in_thread()
+    yield server, address
+    server.stop()
+
+
+def _get(address, target):
+    return json.loads(urllib.request.urlopen('http://%s:%d%s' % (address[0], address[1], target)).read())
+
+
+def test_requests_are_batched(server, prices):
+    server, address = server
+    contracts = [dict(STORAGE, I_max=I_max) for I_max in (60, 100, 100)] + [SWING, dict(SWING, strike=25)]
+    with ValuationClient(address) as client:
+        answers = client.valuate_many(contracts, 'north')
+    assert [a['batch'] for a in answers] == [len(contracts)]*len(contracts)
+    assert answers[1]['price'] == answers[2]['price']
+    expected = StorageLSMC7(30, 1, 24, 0.06, 0.06, 0.59, 100, 0, 10, prices.shape[1], 3, prices).price
+    assert np.isclose(answers[1]['price'], expected, rtol=1e-8)
+    metrics = server.metrics.snapshot([])
+    assert metrics['batches'] == 1 and metrics['contracts_solved'] == 4
+
+
+def test_errors_fail_their_own_requests(server):
+    server, address = server
+    with ValuationClient(address) as client:
+        answers = client.request_many([dict(op='valuate', paths='north', contract=STORAGE),
+                                       dict(op='valuate', paths='north', contract=dict(STORAGE, type='bogus')),
+                                       dict(op='valuate', paths='south', contract=STORAGE),
+                                       dict(op='nothing')])
+        assert 'price' in answers[0]
+        assert 'unknown contract type' in answers[1]['error']
+        assert 'unknown path set' in answers[2]['error']
+        assert 'unknown op' in answers[3]['error']
+        with pytest.raises(ValueError):
+            client.valuate(STORAGE, 'south')
+        assert client.metrics()['errors'] == 4
+
+
+def test_files_are_served_only_when_allowed(store):
+    for allow_files in (False, True):
+        server = ValuationServer(allow_files=allow_files, batch_window=0.)
+        address = server.start_in_thread()
+        try:
+            with ValuationClient(address) as client:
+                answer = client.request_many([dict(op='valuate', paths=store, contract=STORAGE)])[0]
+            assert ('price' in answer) == allow_files
+        finally:
+            server.stop()
+
+
+def test_http_metrics(server):
+    server, address = server
+    body = json.dumps({'paths': 'north', 'contract': SWING}).encode('utf-8')
+    request = urllib.request.Request('http://%s:%d/valuate' % tuple(address), data=body, method='POST')
+    assert json.loads(urllib.request.urlopen(request).read())['price'] > 0
+    metrics = _get(address, '/metrics')
+    assert metrics['requests'] == 1 and metrics['errors'] == 0 and metrics['batches'] == 1
+    assert metrics['queue_depth'] == 0 and metrics['latency_p50_ms'] > 0
+    assert metrics['path_sets'][server.paths['north']]['loaded']
+    assert _get(address, '/health') == {'ok': True}
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen('http://%s:%d/nowhere' % tuple(address))
+    assert error.value.code == 404
+
+
+@pytest.mark.parametrize('length', [b'many', b'-5'])
+def test_http_invalid_content_length(server, length):
+    server, address = server
+    with socket.create_connection(tuple(address)) as connection:
+        connection.sendall(b'POST /valuate HTTP/1.1\r\nContent-Length: ' + length + b'\r\n\r\n{}')
+        response = connection.makefile('rb').read()
+    head, _, body = response.partition(b'\r\n\r\n')
+    assert head.startswith(b'HTTP/1.1 400 Bad Request')
+    assert 'Content-Length' in json.loads(body)['error']
+    assert _get(address, '/health') == {'ok': True}
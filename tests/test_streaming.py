@@ -0,0 +1,78 @@
+import glob
+import os
+import tempfile
+
+import numpy as np
+import pytest
+
+from energy_lsmc.basis import Monomial, Regression
+from energy_lsmc.storagelsmc import StorageLSMC7, StreamingStorageLSMC
+from energy_lsmc.swingoption_lsmc import SwingOptionsLSMC2, StreamingSwingLSMC
+
+STORAGE = (30, 1, 24, 0.06, 0.06, 0.59, 100, 0, 10)
+SWING = (30, 30, 1, 24, 0.06, 0.06, 0.59, 40, 5, 10)
+
+
+@pytest.fixture
+def price_file(prices, tmp_path):
+    filename = str(tmp_path / 'prices.npy')
+    np.save(filename, prices)
+    return filename
+
+
+@pytest.mark.parametrize('deg', [3, 5])
+def test_storage_streaming_matches_in_memory(prices, price_file, deg):
+    memory = StorageLSMC7(*STORAGE + (prices.shape[1], deg, prices))
+    streaming = StreamingStorageLSMC(*STORAGE + (prices.shape[1], deg, price_file), chunk_size=300)
+    assert np.isclose(streaming.price, memory.price, rtol=1e-10)
+    assert np.array_equal(np.asarray(streaming.optimalPolicy), memory.optimalPolicy)
+
+
+@pytest.mark.parametrize('deg', [3, 5])
+def test_swing_streaming_matches_in_memory(prices, price_file, deg):
+    memory = SwingOptionsLSMC2(*SWING + (prices.shape[1], deg, prices))
+    streaming = StreamingSwingLSMC(*SWING + (prices.shape[1], deg, price_file), chunk_size=300)
+    assert np.isclose(streaming.price, memory.price, rtol=1e-10)
+    assert np.array_equal(np.asarray(streaming.optimalPolicy), memory.optimalPolicy)
+
+
+def test_small_chunks_match_in_memory():
+    rng = np.random.default_rng(0)
+    prices = 30*np.exp(np.cumsum(rng.normal(0, 0.05, (49, 200)), axis=0))
+    memory = StorageLSMC7(5, 1, 48, 0.06, 0.06, 0.59, 100, 0, 10, 200, 5, prices)
+    streaming = StreamingStorageLSMC(5, 1, 48, 0.06, 0.06, 0.59, 100, 0, 10, 200, 5, prices, chunk_size=37)
+    assert np.array_equal(np.asarray(streaming.optimalPolicy), memory.optimalPolicy)
+    assert np.isclose(streaming.price, memory.price, rtol=1e-10)
+
+
+@pytest.mark.parametrize('setting', [dict(trace=True), dict(regression=Regression(Monomial(4)))])
+def test_unsupported_settings_raise(setting):
+    engine = StreamingSwingLSMC(*SWING + (1000, 3, None), chunk_size=500)
+    for name, value in setting.items():
+        setattr(engine, name, value)
+    with pytest.raises(ValueError):
+        engine.price
+
+
+@pytest.mark.parametrize('sampling, simulations', [('pseudo', 5000), ('sobol', 4096)])
+def test_simulated_paths_do_not_depend_on_chunk_size(sampling, simulations):
+    results = [StreamingStorageLSMC(*STORAGE + (simulations, 3, None), chunk_size=size, sampling=sampling).price
+               for size in (300, 1000, 100000)]
+    assert results[0] == results[1] == results[2]
+
+
+@pytest.mark.skipif(os.name != 'posix', reason='temporary directories are removed at close() elsewhere')
+def test_temporary_directories_are_removed():
+    pattern = os.path.join(tempfile.gettempdir(), 'lsmc-*')
+    before = set(glob.glob(pattern))
+    engine = StreamingStorageLSMC(*STORAGE + (2000, 3, None), chunk_size=500)
+    engine.price
+    assert np.asarray(engine.optimalPolicy).shape[-1] == 2000
+    assert set(glob.glob(pattern)) == before
+    assert engine.workdir is None
+
+
+def test_workdir_is_kept(tmp_path):
+    engine = StreamingStorageLSMC(*STORAGE + (2000, 3, None), chunk_size=500, workdir=str(tmp_path))
+    engine.price
+    assert os.path.exists(str(tmp_path / 'policy.npy'))
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from energy_lsmc.basis import Chebyshev, Regression
+from energy_lsmc.storagelsmc import StorageLSMC7
+from energy_lsmc.swingoption_lsmc import SwingOptionsLSMC2
+
+STORAGE = (30, 1, 24, 0.06, 0.06, 0.59, 100, 0, 10)
+SWING = (30, 30, 1, 24, 0.06, 0.06, 0.59, 40, 5, 10)
+
+
+def test_tracing_is_off_by_default(prices):
+    engine = StorageLSMC7(*STORAGE + (prices.shape[1], 3, prices))
+    traced = StorageLSMC7(*STORAGE + (prices.shape[1], 3, prices), trace=True)
+    assert engine.price == traced.price
+    assert engine.trace is None
+
+
+def test_storage_trace_arrays(prices):
+    engine = StorageLSMC7(*STORAGE + (prices.shape[1], 3, prices), trace=True)
+    solution = engine.solve()
+    diagnostics = engine.trace.arrays()
+    assert np.array_equal(diagnostics['t'], np.arange(24, 0, -1))
+    assert diagnostics['seconds'].shape == (24,) and np.all(diagnostics['seconds'] >= 0)
+    assert np.all(diagnostics['condition'] >= 1)
+    coefficients = diagnostics['coefficients']
+    assert coefficients.shape == (24, 11, 4)
+    for k, t in enumerate(diagnostics['t']):
+        regressed = ~np.isnan(coefficients[k, :, 0])
+        assert np.array_equal(coefficients[k, regressed], solution.coefficients[t-1].T[regressed])
+        counts = diagnostics['counts'][k]
+        visited = counts[:, 0] >= 0
+        assert np.all(counts[visited].sum(axis=1) == prices.shape[1])
+        for a, action in enumerate((-1, 0, 1)):
+            assert np.array_equal(counts[visited, a], (solution.policy[t-1, visited] == action).sum(axis=1))
+    r2 = diagnostics['r2']
+    assert np.all(r2[~np.isnan(r2)] <= 1 + 1e-12)
+
+
+def test_swing_r2_and_condition(prices):
+    engine = SwingOptionsLSMC2(*SWING + (prices.shape[1], 3, prices), trace=True)
+    engine.price
+    diagnostics = engine.trace.arrays()
+    X = prices[-1]
+    Y = engine.discount*engine._terminal_value(X)
+    A = np.vander(X, 4)
+    assert np.isclose(diagnostics['condition'][0], np.linalg.cond(A/np.sqrt((A*A).sum(axis=0))))
+    for state in range(1, Y.shape[0]):
+        fitted = np.polyval(np.polyfit(X, Y[state], 3), X)
+        r2 = 1 - ((Y[state] - fitted)**2).sum()/((Y[state] - Y[state].mean())**2).sum()
+        assert np.isclose(diagnostics['r2'][0, state], r2)
+    assert np.isnan(diagnostics['r2'][0, 0])   # <-------- no rights left, constant value
+    assert np.array_equal(diagnostics['counts'][:, :, 0] + diagnostics['counts'][:, :, 1],
+                          np.where(diagnostics['counts'][:, :, 0] >= 0, prices.shape[1], -2))
+
+
+def test_trace_of_a_basis_regression(prices):
+    engine = SwingOptionsLSMC2(*SWING + (prices.shape[1], 3, prices), trace=True)
+    engine.regression = Regression(Chebyshev(5))
+    engine.price
+    diagnostics = engine.trace.arrays()
+    assert diagnostics['coefficients'].shape == (24, 9, 6)
+    assert np.all(np.isfinite(diagnostics['condition']))
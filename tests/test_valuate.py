@@ -0,0 +1,92 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from energy_lsmc.storagelsmc import StorageLSMC7
+from energy_lsmc.swingoption_lsmc import SwingOptionsLSMC2
+from energy_lsmc.valuate import main
+
+SWING = ['swing', '--S0', '30', '--strike', '30', '--steps', '24']
+STORAGE = ['storage', '--S0', '30', '--steps', '24', '--deg', '3']
+
+
+def printed(out, name):
+    """ The value printed after name in the output of valuate """
+    line = next(line for line in out.splitlines() if line.startswith(name + ' '))
+    return float(line.split()[2] if name in ('storage', 'swing') else line.split()[1].rstrip(','))
+
+
+def test_simulated_storage_and_swing(capsys):
+    assert main(STORAGE + ['--simulations', '1000']) == 0
+    expected = StorageLSMC7(30, 1, 24, 0.06, 0.06, 0.59, 100, 0, 10, 1000, 3, None).price
+    assert np.isclose(printed(capsys.readouterr().out, 'storage'), expected, rtol=1e-5)
+    assert main(SWING + ['--simulations', '1000']) == 0
+    expected = SwingOptionsLSMC2(30, 30, 1, 24, 0.06, 0.06, 0.59, 40, 5, 10, 1000, 5, None).price
+    assert np.isclose(printed(capsys.readouterr().out, 'swing'), expected, rtol=1e-5)
+
+
+def test_scenario_csv_and_draws(prices, tmp_path, capsys):
+    csv = str(tmp_path / 'paths.csv')
+    header = ','.join('t{}'.format(t) for t in range(prices.shape[0]))
+    np.savetxt(csv, prices.T, delimiter=',', header=header, comments='', fmt='%.17g')
+    assert main(STORAGE + ['--paths', csv]) == 0
+    expected = StorageLSMC7(30, 1, 24, 0.06, 0.06, 0.59, 100, 0, 10, 2000, 3, prices).price
+    assert np.isclose(printed(capsys.readouterr().out, 'storage'), expected, rtol=1e-5)
+    assert (tmp_path / 'paths.paths').exists()   # <-------- converted once, next to the CSV
+    assert main(STORAGE + ['--paths', csv, '--scenarios', '500', '--seed', '7']) == 0
+    drawn = prices[:, np.sort(np.random.default_rng(7).choice(2000, size=500, replace=True))]
+    expected = StorageLSMC7(30, 1, 24, 0.06, 0.06, 0.59, 100, 0, 10, 500, 3, drawn).price
+    assert np.isclose(printed(capsys.readouterr().out, 'storage'), expected, rtol=1e-5)
+
+
+def test_intrinsic_and_greeks(capsys):
+    assert main(STORAGE + ['--simulations', '1000', '--intrinsic']) == 0
+    out = capsys.readouterr().out
+    intrinsic, extrinsic = printed(out, 'intrinsic'), float(out.split('extrinsic ')[1].split()[0])
+    assert np.isclose(intrinsic + extrinsic, printed(out, 'storage'), rtol=1e-4)
+    assert main(SWING + ['--simulations', '1000', '--greeks']) == 0
+    out = capsys.readouterr().out
+    assert all(np.isfinite(printed(out, name)) for name in ('delta', 'gamma', 'vega'))
+
+
+def test_sobol_path_count_is_reported(capsys):
+    assert main(SWING + ['--simulations', '1000', '--sampling', 'sobol']) == 0
+    captured = capsys.readouterr()
+    assert 'uses 1024 paths instead of 1000' in captured.err
+    assert 'swing price' in captured.out
+
+
+def test_bad_input_exits_with_status_1(tmp_path, capsys):
+    assert main(STORAGE + ['--paths', str(tmp_path / 'missing.npy')]) == 1
+    assert capsys.readouterr().err.startswith('valuate: ')
+    with pytest.raises(SystemExit) as exit:
+        main(['forward'])
+    assert exit.value.code == 2
+
+
+def test_entry_point_and_former_modules():
+    out = subprocess.check_output([sys.executable, '-m', 'energy_lsmc.valuate', '--help'],
+                                  cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert b'usage: valuate' in out
+    import storagelsmc
+    import swingoption_lsmc
+    assert storagelsmc.StorageLSMC7 is StorageLSMC7 and swingoption_lsmc.SwingOptionsLSMC2 is SwingOptionsLSMC2
+
+
+def test_lower_bound_on_simulated_paths(capsys):
+    assert main(SWING + ['--simulations', '2000', '--lower-bound', '4000']) == 0
+    assert 'lower bound' in capsys.readouterr().out
+
+
+def test_lower_bound_of_provided_paths_needs_out_of_sample_scenarios(prices, tmp_path, capsys):
+    fitting, other = str(tmp_path / 'fitting.npy'), str(tmp_path / 'other.npy')
+    np.save(fitting, prices[:, :1000])
+    np.save(other, prices[:, 1000:])
+    with pytest.raises(SystemExit):
+        main(SWING + ['--paths', fitting, '--lower-bound', '1000'])
+    assert '--lower-bound-paths' in capsys.readouterr().err
+    assert main(SWING + ['--paths', fitting, '--lower-bound-paths', other]) == 0
+    assert 'lower bound' in capsys.readouterr().out